@@ -0,0 +1,172 @@
+"""Benchmarks for hztrak on synthetic catalogs.
+
+Times find_hz, evolve_star, the orbit converters and the end-to-end HZ track at 1, 1k, 100k and 1M stars,
+recording the best wall time of a few repeats and the peak traced memory. No network access is needed.
+
+Usage:
+    python benchmarks/bench_hztrak.py                                  # fail if anything got slower than the committed baseline
+    python benchmarks/bench_hztrak.py --scales 1 1k --save benchmarks/baseline.json   # record a new baseline
+    python benchmarks/bench_hztrak.py --baseline ''                    # skip the comparison
+    python benchmarks/bench_hztrak.py --scales 1 1k --threshold 3.0
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+
+from hztrak.core import find_hz, find_hz_batch, au_from_orb_per, orb_per_from_au, classify_catalog, PSCOMPPARS_COLUMNS
+from hztrak.evol_calc import evolve_star, iter_population, hz_track
+
+SCALES = {'1': 1, '1k': 1000, '100k': 100000, '1M': 1000000}
+#Benchmarks calling a Python-level function once per star only run up to this catalog size
+MAX_LOOP_SIZE = 1000
+STEPS = 20
+CHUNK_SIZE = 50000
+#Differences below these are timer/allocator noise and never count as regressions
+NOISE_FLOOR = {'wall_s': 0.01, 'peak_mb': 1.0}
+#Committed results at the 1 and 1k scales, compared against by default; larger scales have no baseline
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def synthetic_catalog(n, seed=0):
+    """Returns a get_current_parameters-like DataFrame of n random main sequence systems."""
+    rng = np.random.default_rng(seed)
+    mass = rng.uniform(0.1, 3.0, n)
+    df = pd.DataFrame({
+        'pl_name': [f'Synth-{i} b' for i in range(n)],
+        'hostname': [f'Synth-{i}' for i in range(n)],
+        'pl_rade': np.nan, 'pl_bmasse': np.nan, 'pl_ratror': np.nan,
+        'st_teff': rng.uniform(2700, 7000, n),
+        'st_rad': mass ** 0.8,
+        'st_mass': mass,
+        'st_lum': np.log10(mass ** 3.5),
+        'st_age': rng.uniform(0.5, 10, n),
+        'pl_orbper': 10 ** rng.uniform(0, 3, n),
+        'pl_orbsmax': np.nan,
+    })
+    return df[PSCOMPPARS_COLUMNS]
+
+def bench_find_hz(df):
+    find_hz_batch(df['st_teff'].to_numpy(), 10 ** df['st_lum'].to_numpy())
+
+def bench_find_hz_scalar(df):
+    for teff, lum in zip(df['st_teff'], 10 ** df['st_lum']):
+        try:
+            find_hz(teff, lum)
+        except RuntimeError:
+            pass
+
+def bench_evolve_star(df):
+    for row in df.itertuples():
+        evolve_star(10 ** row.st_lum, row.st_rad, row.st_teff, row.st_mass, t_f=row.st_age, steps=STEPS)
+
+def bench_evolve_population(df):
+    for _ in iter_population(10 ** df['st_lum'].to_numpy(), df['st_rad'].to_numpy(), df['st_teff'].to_numpy(),
+                             df['st_mass'].to_numpy(), t_f=10, steps=STEPS, chunk_size=CHUNK_SIZE):
+        pass
+
+def bench_orbits(df):
+    axes = au_from_orb_per(df['st_mass'], df['pl_orbper'])
+    orb_per_from_au(df['st_mass'], axes)
+
+def bench_hz_track(df):
+    for row in df.to_dict('records'):
+        star = {'st_lum': 10 ** row['st_lum'], 'st_rad': row['st_rad'], 'st_teff': row['st_teff'], 'st_mass': row['st_mass']}
+        hz_track(star, t_f=row['st_age'], steps=STEPS)
+
+def bench_hz_track_population(df):
+    for _, L, R, T in iter_population(10 ** df['st_lum'].to_numpy(), df['st_rad'].to_numpy(), df['st_teff'].to_numpy(),
+                                      df['st_mass'].to_numpy(), t_f=10, steps=STEPS, chunk_size=CHUNK_SIZE):
+        find_hz_batch(T, L)
+
+def bench_classify_catalog(df):
+    classify_catalog(df)
+
+#name: (function, calls a Python function per star)
+BENCHMARKS = {
+    'find_hz': (bench_find_hz, False),
+    'find_hz_scalar': (bench_find_hz_scalar, True),
+    'evolve_star': (bench_evolve_star, True),
+    'evolve_population': (bench_evolve_population, False),
+    'orbits': (bench_orbits, False),
+    'hz_track': (bench_hz_track, True),
+    'hz_track_population': (bench_hz_track_population, False),
+    'classify_catalog': (bench_classify_catalog, False),
+}
+
+
+def measure(func, df, repeat=3):
+    """Returns the best wall time (s) of repeat calls and the peak memory (MB) traced during one call."""
+    wall = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        wall.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'wall_s': min(wall), 'peak_mb': peak / 2 ** 20}
+
+def run(scales=tuple(SCALES), names=tuple(BENCHMARKS), repeat=3):
+    """Run the benchmarks, returns {'<name>[<scale>]': {'wall_s': ..., 'peak_mb': ...}}."""
+    results = {}
+    for scale in scales:
+        df = synthetic_catalog(SCALES[scale])
+        for name in names:
+            func, per_star = BENCHMARKS[name]
+            if per_star and SCALES[scale] > MAX_LOOP_SIZE:
+                continue
+            results[f'{name}[{scale}]'] = measure(func, df, repeat)
+    return results
+
+def compare(results, baseline, threshold=2.0):
+    """Returns a list of messages for every result slower (or using more memory) than threshold times the baseline.
+
+    Differences within NOISE_FLOOR are ignored, so sub-millisecond benchmarks do not flag jitter.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ('wall_s', 'peak_mb'):
+            ratio = result[metric] / max(baseline[key][metric], 1e-9)
+            if ratio > threshold and result[metric] - baseline[key][metric] > NOISE_FLOOR[metric]:
+                regressions.append(f'{key} {metric}: {result[metric]:.4g} vs baseline {baseline[key][metric]:.4g} ({ratio:.2f}x)')
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=list(SCALES), choices=list(SCALES))
+    parser.add_argument('--bench', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="JSON results to compare against, '' to skip (default: the committed benchmarks/baseline.json)")
+    parser.add_argument('--threshold', type=float, default=2.0, help='allowed slowdown/memory ratio (default: %(default)s)')
+    parser.add_argument('--save', help='write the results as JSON, e.g. to use as a baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.bench, args.repeat)
+    for key, result in results.items():
+        print(f"{key:32s} {result['wall_s'] * 1e3:12.3f} ms {result['peak_mb']:10.2f} MB")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for message in regressions:
+            print('REGRESSION', message)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
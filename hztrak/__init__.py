@@ -1,3 +1 @@
 __version__= "0.0.1"
-
-print('Welcome to our package HZTrak! Your very own Habitable Zone Tracker for stellar evolution')
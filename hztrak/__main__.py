@@ -0,0 +1,3 @@
+from hztrak.cli import main
+
+main()
@@ -0,0 +1,145 @@
+import json
+import asyncio
+import http.client
+from urllib.parse import urlsplit, urlencode
+
+from hztrak.core import PSCOMPPARS_COLUMNS, ARCHIVE_CHUNK_SIZE
+from hztrak.mirror import STRING_COLUMNS
+
+TAP_URL = 'https://exoplanetarchive.ipac.caltech.edu/TAP/sync'
+#HTTP statuses worth retrying: rate limited or a temporary server problem
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class ArchiveError(RuntimeError):
+    """Raised when an archive query fails for good."""
+
+
+def pscomppars_query(names, columns=PSCOMPPARS_COLUMNS):
+    """Returns the ADQL query selecting columns of the pscomppars rows of names."""
+    quoted = ','.join("'" + name.replace("'", "''") + "'" for name in names)
+    return f"select {','.join(columns)} from pscomppars where pl_name in ({quoted})"
+
+
+class AsyncArchiveClient:
+    """Concurrent client for the NASA Exoplanet Archive TAP service.
+
+    Queries run on worker threads over a pool of keep-alive HTTP connections, so many requests are in flight at once
+    while the event loop stays free. At most concurrency requests run at a time and, with rate, requests start at
+    most rate times per second. Connection errors, timeouts and RETRY_STATUS responses are retried up to retries
+    times, waiting backoff * 2**attempt seconds in between.
+
+    Args:
+        url (str): TAP sync endpoint
+        concurrency (int): maximum number of requests in flight
+        rate (float): maximum requests started per second, None for no limit
+        retries (int): retries of a failed request before ArchiveError is raised
+        backoff (float): wait before the first retry in seconds, doubled for every further retry
+        timeout (float): seconds allowed for each request
+    """
+
+    def __init__(self, url=TAP_URL, concurrency=8, rate=None, retries=3, backoff=0.5, timeout=60.0):
+        parts = urlsplit(url)
+        self.url = url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.netloc
+        self._path = parts.path or '/'
+        self._idle = []   # open connections ready for the next request
+        self._loop = None
+        self._semaphore = None
+        self._rate_lock = None
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the pooled connections."""
+        while self._idle:
+            self._idle.pop().close()
+
+    def __send(self, connection, path):
+        """Blocking request, run on a worker thread."""
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    async def __throttle(self):
+        """Wait for the next start slot allowed by rate."""
+        if not self.rate:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._rate_lock:
+            now = loop.time()
+            start = max(now, self._next_start)
+            self._next_start = start + 1 / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def query(self, adql):
+        """Run one ADQL query.
+
+        Args:
+            adql (str): query, e.g. from pscomppars_query
+        Returns:
+            list: one dict per row
+        Raises:
+            ArchiveError: when the archive rejects the query, or it still fails after all retries
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:   # asyncio primitives belong to one event loop
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._rate_lock = asyncio.Lock()
+            self._next_start = 0.0
+        path = f"{self._path}?{urlencode({'query': adql, 'format': 'json'})}"
+
+        for attempt in range(self.retries + 1):
+            await self.__throttle()
+            async with self._semaphore:
+                connection = self._idle.pop() if self._idle else self._connection_class(self._host, timeout=self.timeout)
+                try:
+                    status, body = await asyncio.wait_for(asyncio.to_thread(self.__send, connection, path), self.timeout)
+                except (asyncio.TimeoutError, OSError, http.client.HTTPException) as e:
+                    connection.close()
+                    error = e
+                else:
+                    self._idle.append(connection)
+                    if status == 200:
+                        return json.loads(body)
+                    error = ArchiveError(f'archive returned HTTP {status}: {body[:200].decode(errors="replace")}')
+                    if status not in RETRY_STATUS:
+                        raise error
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        raise ArchiveError(f'archive query failed after {self.retries + 1} attempts: {error}') from error
+
+    async def iter_planets(self, names, columns=PSCOMPPARS_COLUMNS, chunk_size=ARCHIVE_CHUNK_SIZE):
+        """Fetch the pscomppars rows of names with one query per chunk of chunk_size names, all issued at once.
+
+        Args:
+            names (list): planet names
+            columns (list): pscomppars columns to select
+            chunk_size (int): planet names per query
+        Yields:
+            pd.DataFrame: the rows of each chunk as soon as its response arrives, in completion order
+        """
+        import pandas as pd
+
+        tasks = [asyncio.ensure_future(self.query(pscomppars_query(names[i:i + chunk_size], columns)))
+                 for i in range(0, len(names), chunk_size)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                df = pd.DataFrame.from_records(await task, columns=columns)
+                yield df.astype({col: float for col in columns if col not in STRING_COLUMNS})
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,155 @@
+import os
+import json
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from hztrak.core import find_hz_batch, HZ_LABELS
+from hztrak.evol_calc import alpha_beta_gamma_batch, luminosity_evolve, radius_evolve, temp_evolve
+
+#Grid axes of the atlas, in the order of the dimensions of the edges array
+ATLAS_AXES = ('st_mass', 'st_teff', 'st_lum', 'age_yr')
+EDGES = 'edges.npy'
+META = 'atlas.json'
+
+
+class HZAtlas:
+    """Habitable zone edges precomputed on a (mass, Teff_0, L_0, age) grid, see build_atlas.
+
+    Calling the atlas interpolates the edges of any stars at once. Interpolation is multilinear in
+    (mass, Teff_0, log10 L_0, age) on the log of the edges: the evolved temperature does not depend on L_0 and the
+    edges scale as sqrt(L_0), so the L_0 direction is exact. The mass only enters through the mass bins of
+    alpha_beta_gamma, so cells spanning a bin edge (MASS_BREAKS) blend the two bins.
+
+    Args:
+        axes (dict): increasing 1D grid of every axis of ATLAS_AXES, st_mass [Msun], st_teff [K], st_lum [Lsun] and age_yr
+        edges (np.ndarray): HZ_LABELS distances [AU] of shape (len(st_mass), len(st_teff), len(st_lum), len(age_yr), 6)
+        t_f (float): end time of the evolution the ages are taken from (yr)
+        path (str): directory the atlas is stored in, if any
+    """
+
+    def __init__(self, axes, edges, t_f, path=None):
+        self.axes = {name: np.asarray(axes[name], dtype=float) for name in ATLAS_AXES}
+        self.edges = edges
+        self.t_f = float(t_f)
+        self.path = path
+
+    @property
+    def shape(self):
+        return self.edges.shape[:-1]
+
+    @classmethod
+    def load(cls, path):
+        """Open an atlas written by build_atlas, with the edges memory-mapped."""
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+        return cls(meta['axes'], np.load(os.path.join(path, EDGES), mmap_mode='r'), meta['t_f'], path)
+
+    def __call__(self, st_mass, st_teff, st_lum, age):
+        """Interpolate the habitable zone edges of stars, all arguments broadcast against each other.
+
+        Args:
+            st_mass (array-like): masses [Msun]
+            st_teff (array-like): initial effective temperatures [K]
+            st_lum (array-like): initial luminosities [Lsun]
+            age (array-like): times along the evolution [yr]
+        Returns:
+            tuple: (distances, valid) like find_hz_batch, distances of shape (..., 6) in AU ordered as HZ_LABELS,
+            NaN where a star is outside the atlas or its edges are undefined
+        """
+        values = list(np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (st_mass, st_teff, st_lum, age))))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values[2] = np.log10(values[2])
+        grids = [self.axes['st_mass'], self.axes['st_teff'], np.log10(self.axes['st_lum']), self.axes['age_yr']]
+
+        valid = np.ones(values[0].shape, dtype=bool)
+        idx, frac = [], []
+        for grid, x in zip(grids, values):
+            inside = (x >= grid[0]) & (x <= grid[-1])
+            valid &= inside
+            i = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+            idx.append(i)
+            frac.append(np.where(inside, (x - grid[i]) / (grid[i + 1] - grid[i]), 0.0))
+
+        log_edges = np.zeros(values[0].shape + (len(HZ_LABELS),))
+        for corner in itertools.product((0, 1), repeat=len(ATLAS_AXES)):
+            weight = np.prod([f if c else 1 - f for f, c in zip(frac, corner)], axis=0)[..., np.newaxis]
+            corner_edges = self.edges[tuple(i + c for i, c in zip(idx, corner))]
+            log_edges += np.where(weight > 0, weight * np.log(np.where(weight > 0, corner_edges, 1.0)), 0.0)
+
+        distances = np.where(valid[..., np.newaxis], np.exp(log_edges), np.nan)
+        valid = np.isfinite(distances) & (distances > 0)
+        return np.where(valid, distances, np.nan), valid
+
+
+def __check_axis(name, values):
+    """Helper method validating one grid axis."""
+    values = np.asarray(values, dtype=float).ravel()
+    if len(values) < 2 or not (np.diff(values) > 0).all():
+        raise ValueError(f"{name} axis needs at least two strictly increasing values")
+    if name != 'age_yr' and values[0] <= 0:
+        raise ValueError(f"{name} axis must be positive")
+    return values
+
+def fill_atlas_slab(path, axes, t_f, index):
+    """Compute the edges of one mass of the grid and write them into the memory-mapped edges of the atlas at path.
+
+    Runs on the worker processes of build_atlas; only the small axes travel to the worker and nothing is returned,
+    the results go straight into the shared file.
+
+    Args:
+        path (str): atlas directory
+        axes (dict): grid axes
+        t_f (float): end time of the evolution (yr)
+        index (int): position of the mass on the st_mass axis
+    """
+    edges = np.load(os.path.join(path, EDGES), mmap_mode='r+')
+    mass = axes['st_mass'][index]
+    teff, lum, age = axes['st_teff'][:, np.newaxis], axes['st_lum'][:, np.newaxis], axes['age_yr']
+    alpha, beta, gamma = (p[0] for p in alpha_beta_gamma_batch([mass]))
+
+    #T does not depend on L_0, so it only needs the (Teff_0, age) plane; L only needs the (L_0, age) plane
+    L = luminosity_evolve(lum, beta, t_f, age, alpha)
+    R = radius_evolve(1.0, gamma, t_f, age, alpha)
+    T = temp_evolve(teff, L[:1], lum[:1], R, 1.0)
+    distances, _ = find_hz_batch(T[:, np.newaxis, :], L[np.newaxis, :, :])
+    edges[index] = distances
+    edges.flush()
+
+def build_atlas(path, st_mass, st_teff, st_lum, age_yr, t_f=1e10, workers=None):
+    """Compute the habitable zone edges over a (mass, Teff_0, L_0, age) grid of hypothetical stars.
+
+    Every grid star starts at (Teff_0, L_0) and is evolved with the laws of evol_calc up to t_f; the edges are taken
+    at each age along that evolution. The edges are written into a memory-mapped .npy in the atlas directory by a
+    ProcessPoolExecutor, one mass per task, so results are never pickled back to this process.
+
+    Args:
+        path (str): atlas directory, created if needed
+        st_mass (array-like): increasing masses [Msun]
+        st_teff (array-like): increasing initial effective temperatures [K]
+        st_lum (array-like): increasing initial luminosities [Lsun]
+        age_yr (array-like): increasing times along the evolution, within [0, t_f] [yr]
+        t_f (float): end time of the evolution (yr)
+        workers (int): worker processes, None uses all cores and 1 runs in this process
+    Returns:
+        HZAtlas: the atlas, read back from path
+    Raises:
+        ValueError: if an axis is not strictly increasing, too short or not positive
+    """
+    axes = {name: __check_axis(name, values) for name, values in zip(ATLAS_AXES, (st_mass, st_teff, st_lum, age_yr))}
+    shape = tuple(len(axes[name]) for name in ATLAS_AXES) + (len(HZ_LABELS),)
+    os.makedirs(path, exist_ok=True)
+    np.lib.format.open_memmap(os.path.join(path, EDGES), mode='w+', dtype='<f8', shape=shape).flush()
+
+    if workers == 1:
+        for i in range(shape[0]):
+            fill_atlas_slab(path, axes, t_f, i)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(fill_atlas_slab, path, axes, t_f, i) for i in range(shape[0])]:
+                future.result()
+
+    with open(os.path.join(path, META), 'w') as f:
+        json.dump({'axes': {name: values.tolist() for name, values in axes.items()}, 't_f': t_f,
+                   'labels': list(HZ_LABELS)}, f)
+    return HZAtlas.load(path)
@@ -0,0 +1,116 @@
+import argparse
+import sys
+
+
+def __read_names(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def run(args):
+    """Entry point of `hztrak run`."""
+    from hztrak.core import get_current_parameters
+    from hztrak.pipeline import run_catalog, update_catalog, duplicate_work
+
+    if args.names is not None:
+        names = __read_names(args.names)
+    elif args.mirror is not None:
+        from hztrak.mirror import load_mirror
+        names = list(load_mirror(args.mirror).name_index)
+    else:
+        raise SystemExit("hztrak run: give a file of planet names or --mirror")
+
+    df = get_current_parameters(names, mirror=args.mirror)
+    if args.incremental:
+        stats = update_catalog(df, args.out, t_f=args.t_final, steps=args.steps, chunk_size=args.chunk_size,
+                               workers=args.workers)
+        print(f"{len(df)} planets, {stats['computed']} computed, {stats['reused']} unchanged, "
+              f"{stats['removed']} removed, results in {args.out}")
+        return
+    done = run_catalog(df, args.out, t_f=args.t_final, steps=args.steps, chunk_size=args.chunk_size,
+                       workers=args.workers, resume=not args.no_resume)
+    work = duplicate_work(df, args.chunk_size)
+    print(f"{work['planets']} planets around {work['hosts']} host evolutions ({work['avoided']} duplicate host "
+          f"evolutions avoided), {len(done)} chunks computed, results in {args.out}")
+
+def mirror(args):
+    """Entry point of `hztrak mirror`."""
+    from hztrak.mirror import snapshot_pscomppars, DEFAULT_MIRROR_PATH
+    print(snapshot_pscomppars(args.path or DEFAULT_MIRROR_PATH))
+
+def plot(args):
+    """Entry point of `hztrak plot`."""
+    from hztrak.pipeline import load_results
+    from hztrak.plotting import export_systems, iter_result_systems
+
+    results = load_results(args.results)
+    if not results:
+        raise SystemExit(f"hztrak plot: no results in {args.results}, run `hztrak run` first")
+    paths = export_systems(iter_result_systems(results), args.out, fmt=args.format, workers=args.workers)
+    print(f'{len(paths)} figures written to {args.out}')
+
+def query(args):
+    """Entry point of `hztrak query`."""
+    from hztrak.pipeline import load_results
+    from hztrak.plotting import iter_result_systems
+    from hztrak.hzindex import HZIndex
+
+    results = load_results(args.results)
+    if not results:
+        raise SystemExit(f"hztrak query: no results in {args.results}, run `hztrak run` first")
+    index = HZIndex(zone=args.zone)
+    index.add((host, track) for host, track, _ in iter_result_systems(results))
+    hosts = index.query(args.distance, args.age, args.distance_max)
+    print('\n'.join(hosts))
+    print(f'{len(hosts)} of {len(index)} systems', file=sys.stderr)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='hztrak', description='Habitable zone tracker for stellar evolution. '
+                                     'Without a command, prompts for one planet and plots its habitable zone.')
+    commands = parser.add_subparsers(dest='command')
+
+    run_parser = commands.add_parser('run', help='evolve every system of a catalog and store the habitable zone tracks')
+    run_parser.add_argument('names', nargs='?', help='text file with one planet name per line, defaults to every planet of --mirror')
+    run_parser.add_argument('--mirror', help='local pscomppars mirror to read parameters from instead of the archive')
+    run_parser.add_argument('--out', default='hztrak_results', help='output directory (default: %(default)s)')
+    run_parser.add_argument('--steps', type=int, default=100, help='time steps per track (default: %(default)s)')
+    run_parser.add_argument('--t-final', type=float, default=None, help="end time of the tracks, defaults to each star's age")
+    run_parser.add_argument('--chunk-size', type=int, default=500, help='planets per chunk (default: %(default)s)')
+    run_parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    run_parser.add_argument('--no-resume', action='store_true', help='recompute chunks already in the output directory')
+    run_parser.add_argument('--incremental', action='store_true',
+                            help='only recompute planets whose inputs changed since the last run in the output directory, and drop removed ones')
+    run_parser.set_defaults(func=run)
+
+    mirror_parser = commands.add_parser('mirror', help='snapshot the archive columns used by hztrak for offline runs')
+    mirror_parser.add_argument('path', nargs='?', help='output file (default: ~/.hztrak/pscomppars.npy)')
+    mirror_parser.set_defaults(func=mirror)
+
+    plot_parser = commands.add_parser('plot', help='export one habitable zone figure per system of a run, without a display')
+    plot_parser.add_argument('results', help='output directory of `hztrak run`')
+    plot_parser.add_argument('--out', default='hztrak_figures', help='directory for the figures (default: %(default)s)')
+    plot_parser.add_argument('--format', default='png', help='figure format, e.g. png or svg (default: %(default)s)')
+    plot_parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    plot_parser.set_defaults(func=plot)
+
+    query_parser = commands.add_parser('query', help='list the systems of a run whose habitable zone covers a distance at an age')
+    query_parser.add_argument('results', help='output directory of `hztrak run`')
+    query_parser.add_argument('--distance', type=float, required=True, help='distance from the star (AU)')
+    query_parser.add_argument('--distance-max', type=float, default=None, help='match any distance up to this one (AU)')
+    query_parser.add_argument('--age', type=float, required=True, help='age (Gyr), in the time unit of the stored tracks')
+    query_parser.add_argument('--zone', default='conservative', help='habitable zone scenario (default: %(default)s)')
+    query_parser.set_defaults(func=query)
+
+    return parser
+
+def main(argv=None):
+    """Entry point of the `hztrak` console script."""
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        from hztrak.evol_calc import main as interactive
+        interactive()
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
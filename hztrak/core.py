@@ -1,46 +1,198 @@
 #Authors:
-from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
 from astropy import units as u
 from astropy.units import Quantity, UnitTypeError
 from astropy.constants import R_earth, M_earth, R_sun, M_sun, G
 
-import pandas as pd
 from math import pi
+from collections import OrderedDict
+from functools import lru_cache
+import os
+import time
 import numpy as np
-import matplotlib.axes
-from astropy.table import Table, vstack, QTable
-import matplotlib.pyplot as plt
+from hztrak.instrument import timed
+#pandas, astroquery and astropy.table are imported inside the functions that need them to keep `import hztrak.core` fast
  
 
 
-def get_current_parameters(planet_name=['Kepler-22 b']):
+#Columns of the pscomppars table used by hztrak, selected server-side
+PSCOMPPARS_COLUMNS = ['pl_name','hostname','pl_rade','pl_bmasse','pl_ratror','st_teff','st_rad','st_mass','st_lum','st_age','pl_orbper','pl_orbsmax']
+#Upper (err1) and lower (err2, negative) uncertainties of the stellar parameters, fetched with uncertainties=True
+PSCOMPPARS_ERROR_COLUMNS = [f'{col}err{i}' for col in ('st_teff', 'st_lum', 'st_mass', 'st_age') for i in (1, 2)]
+#Number of planet names sent per IN (...) where-clause, keeps the TAP query well below URL length limits
+ARCHIVE_CHUNK_SIZE = 100
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.hztrak', 'pscomppars_cache.pkl')
+DEFAULT_CACHE_TTL = 7 * 24 * 3600 # seconds
+
+
+def __read_cache(cache_path, ttl, columns=PSCOMPPARS_COLUMNS):
+    """Helper method to load the on-disk parameter cache, keeping only entries younger than ttl seconds."""
+    import pandas as pd
+    if cache_path is None or not os.path.exists(cache_path):
+        #typed empty columns, so rows concatenated onto the cache keep their float dtypes
+        return pd.DataFrame({col: pd.Series(dtype=object if col in ('pl_name', 'hostname') else float)
+                             for col in columns + ['fetched']}).set_index('pl_name')
+    cache = pd.read_pickle(cache_path)
+    return cache[(time.time() - cache['fetched']) < ttl]
+
+def __write_cache(cache_path, cache, new_rows):
+    """Helper method to merge freshly fetched rows into the on-disk parameter cache."""
+    import pandas as pd
+    if cache_path is None or len(new_rows) == 0:
+        return
+    new_rows = new_rows.set_index('pl_name')
+    new_rows['fetched'] = time.time()
+    merged = pd.concat([cache[~cache.index.isin(new_rows.index)], new_rows])
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    merged.to_pickle(cache_path)
+
+def __cache_file(cache_path, uncertainties):
+    """Helper method returning the cache file, kept separate for tables with uncertainty columns."""
+    if uncertainties and cache_path is not None:
+        root, ext = os.path.splitext(cache_path)
+        return f'{root}_err{ext}'
+    return cache_path
+
+def __query_archive(names, archive, chunk_size, columns=PSCOMPPARS_COLUMNS):
+    """Helper method to fetch the pscomppars rows for names with one IN (...) query per chunk."""
+    import pandas as pd
+    from astropy.table import vstack
+    table_list = []
+    for i in range(0, len(names), chunk_size):
+        quoted = ','.join("'" + name.replace("'", "''") + "'" for name in names[i:i + chunk_size])
+        tab = archive.query_criteria(table="pscomppars", select=','.join(columns), where=f"pl_name in ({quoted})")
+        if len(tab) > 0:
+            table_list.append(tab[columns])
+    if len(table_list) == 0:
+        return pd.DataFrame(columns=columns)
+    return vstack(table_list).to_pandas()
+
+@timed('fetch')
+def get_current_parameters(planet_name=['Kepler-22 b'], cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_CACHE_TTL,
+                           archive=None, chunk_size=ARCHIVE_CHUNK_SIZE, mirror=None, uncertainties=False):
     """Returns a dataframe of planet and host star parameters. Parameters include planet name, host star name, planet radius [Rearth], 
     planet mass [Mearth], ratio of planet to stellar radius, stellar effective temperature [K],
    stellar radius [Rsun], stellar mass [Msun],stellar luminosity [log10(Solar)], stellar age [Gyr], orbital period [days],
    and orbit semi-major axis [AU].
 
+   Planets are fetched in bulk with batched IN (...) queries and kept in an on-disk cache, so repeat runs
+   only query the archive for names that are missing or older than ttl.
+
    Args:
-        name_planet (list): list of planet names in nasa exoplanet archive
+        planet_name (list): list of planet names in nasa exoplanet archive
+        cache_path (str): pickle file used as the parameter cache, or None to disable caching
+        ttl (float): seconds after which a cached entry is fetched again
+        archive: object providing query_criteria, defaults to NasaExoplanetArchive
+        chunk_size (int): number of planet names per archive query
+        mirror (str or PlanetMirror): local pscomppars mirror to resolve names from instead of the archive and cache
+        uncertainties (bool): also return the PSCOMPPARS_ERROR_COLUMNS uncertainties of st_teff, st_lum, st_mass and st_age
     Returns:
-        Astropy Table: Planet names and parameters for the planet and host star
+        pd.DataFrame: Planet names and parameters for the planet and host star, in the order requested
     Raises:
         Statement: Raises when a planet isn't found in exoplanet database
 
     
     """
-    table_list=[]
-    for i in range(len(planet_name)):
-        tab = NasaExoplanetArchive.query_criteria(table="pscomppars", where=f"pl_name='{planet_name[i]}'")
-        sub_tab=tab['pl_name','hostname','pl_rade','pl_bmasse','pl_ratror','st_teff','st_rad','st_mass','st_lum','st_age','pl_orbper','pl_orbsmax']
-        if len(sub_tab)==0:
-            print(f'{planet_name[i]} not found! Try again bestie :/')
-            continue
+    columns = PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS if uncertainties else PSCOMPPARS_COLUMNS
+    if mirror is not None:
+        from hztrak.mirror import load_mirror
+        if isinstance(mirror, str):
+            mirror = load_mirror(mirror)
+        if not set(columns) <= set(mirror.columns):
+            raise ValueError(f"{mirror.path} has no uncertainty columns, take a new snapshot")
+        for name in planet_name:
+            if name not in mirror:
+                print(f'{name} not found! Try again bestie :/')
+        return mirror.lookup(planet_name)[columns]
+
+    import pandas as pd
+    cache_path = __cache_file(cache_path, uncertainties)
+    cache = __read_cache(cache_path, ttl, columns)
+    missing = list(dict.fromkeys(name for name in planet_name if name not in cache.index))
+
+    if len(missing) > 0:
+        if archive is None:
+            from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
+            archive = NasaExoplanetArchive
+        fetched = __query_archive(missing, archive, chunk_size, columns)
+        __write_cache(cache_path, cache, fetched)
+        cache = pd.concat([cache, fetched.set_index('pl_name')])
+
+    found = []
+    for name in planet_name:
+        if name in cache.index:
+            found.append(name)
         else:
-            table_list.append(sub_tab)
-        final_tab=vstack(table_list)
-        df=final_tab.to_pandas()
+            print(f'{name} not found! Try again bestie :/')
+
+    df = cache.loc[found].reset_index()[columns]
     return df
 
+async def iter_current_parameters(planet_name, cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_CACHE_TTL, client=None,
+                                  chunk_size=ARCHIVE_CHUNK_SIZE, uncertainties=False):
+    """Async variant of get_current_parameters yielding the parameters as they become available.
+
+    Cached planets come first, then the archive chunks are queried concurrently and each one is yielded as soon as its
+    response arrives, so work on the first planets can start before the whole catalog is fetched.
+
+    Args:
+        planet_name (list): list of planet names in nasa exoplanet archive
+        cache_path (str): pickle file used as the parameter cache, or None to disable caching
+        ttl (float): seconds after which a cached entry is fetched again
+        client (AsyncArchiveClient): archive client, a default hztrak.archive.AsyncArchiveClient is used if None
+        chunk_size (int): number of planet names per archive query
+        uncertainties (bool): also return the PSCOMPPARS_ERROR_COLUMNS
+    Yields:
+        pd.DataFrame: parameters of a batch of the planets, in arrival order
+    """
+    import pandas as pd
+    columns = PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS if uncertainties else PSCOMPPARS_COLUMNS
+    cache_path = __cache_file(cache_path, uncertainties)
+    cache = __read_cache(cache_path, ttl, columns)
+    requested = list(dict.fromkeys(planet_name))
+    cached = [name for name in requested if name in cache.index]
+    missing = [name for name in requested if name not in cache.index]
+    if len(cached) > 0:
+        yield cache.loc[cached].reset_index()[columns]
+    if len(missing) == 0:
+        return
+
+    from hztrak.archive import AsyncArchiveClient
+    owned = client is None
+    client = AsyncArchiveClient() if owned else client
+    fetched = []
+    try:
+        async for df in client.iter_planets(missing, columns, chunk_size):
+            fetched.append(df)
+            yield df
+    finally:
+        if owned:
+            client.close()
+        if len(fetched) > 0:
+            __write_cache(cache_path, cache, pd.concat(fetched, ignore_index=True))
+
+    found = set(name for df in fetched for name in df['pl_name'])
+    for name in missing:
+        if name not in found:
+            print(f'{name} not found! Try again bestie :/')
+
+async def get_current_parameters_async(planet_name=['Kepler-22 b'], cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_CACHE_TTL,
+                                       client=None, chunk_size=ARCHIVE_CHUNK_SIZE, uncertainties=False):
+    """Async variant of get_current_parameters, with the archive chunks queried concurrently.
+
+    Args:
+        see iter_current_parameters
+    Returns:
+        pd.DataFrame: Planet names and parameters for the planet and host star, in the order requested
+    """
+    import pandas as pd
+    columns = PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS if uncertainties else PSCOMPPARS_COLUMNS
+    parts = [df async for df in iter_current_parameters(planet_name, cache_path, ttl, client, chunk_size, uncertainties)]
+    if len(parts) == 0:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(parts, ignore_index=True).set_index('pl_name')
+    found = [name for name in planet_name if name in df.index]
+    return df.loc[found].reset_index()[columns]
+
 
 def __ensure_unit(x, unit: u.Unit):
     """Helper method to ensure input units are correct.
@@ -65,29 +217,342 @@ def __ensure_unit(x, unit: u.Unit):
             raise u.UnitTypeError(f"{x} cannot be converted to {unit}")
     return x
 
+def __strip_unit(x, unit: u.Unit):
+    """Helper method returning x as plain float values in unit, the unit-free counterpart of __ensure_unit.
+
+    Args:
+        x (any): Number, array or Quantity
+        unit (astropy.units.Unit): Unit assumed for generic numbers and converted to for Quantities
+    Returns:
+        float or np.ndarray: Value(s) of x in unit
+    Raises:
+        UnitTypeError: Raised when quantity requires conversion, but conversion cannot be completed
+    """
+    if not isinstance(x, Quantity):
+        return np.asarray(x, dtype=float)
+    try:
+        return x.to_value(unit)
+    except u.UnitConversionError as uce:
+        raise u.UnitTypeError(f"{x} cannot be converted to {unit}")
+
+#Unit-free kernels. Inputs and outputs are float64 arrays in AU, days and solar units.
+#2*pi*sqrt(AU^3 / (G*Msun)) in days, so that P[d] = KEPLER_DAYS * sqrt(a[AU]^3 / M[Msun])
+KEPLER_DAYS = (2 * pi * np.sqrt(u.AU ** 3 / (G * M_sun))).to_value(u.d)
+
 def __dist_from_Seff(Seff, L):
     """Helper method to convert Seff to distance (AU)"""
     #L must be in solar units
     d = (L / Seff) ** 0.5
     return d
 
+def __kepler_period_days(st_mass, au):
+    """Helper kernel: orbital period (days) from stellar mass (Msun) and semi-major axis (AU) as plain floats."""
+    return KEPLER_DAYS * np.sqrt(au ** 3 / st_mass)
+
+def __kepler_axis_au(st_mass, orb_per):
+    """Helper kernel: semi-major axis (AU) from stellar mass (Msun) and orbital period (days) as plain floats."""
+    return np.cbrt(st_mass * (orb_per / KEPLER_DAYS) ** 2)
+
+#Quantity adapters around the kernels, units are stripped once at the boundary.
+
 def __orb_per_from_au(st_mass, au):
-    a = au if isinstance(au, u.Quantity) else au * u.AU
-    M = __ensure_unit(st_mass, u.Msun)
-    T = 2 * pi * np.sqrt((a.to(u.m) ** 3) / (G * M))
+    M = __strip_unit(st_mass, u.Msun)
+    a = __strip_unit(au, u.AU)
 
-    return T.to(u.d)
+    return __kepler_period_days(M, a) * u.d
 
 def __au_from_orb_per(st_mass, orb_per):
     if orb_per is None or st_mass is None:
         return None
-    M = __ensure_unit(st_mass, u.Msun)
-    T = __ensure_unit(orb_per, u.d)
+    M = __strip_unit(st_mass, u.Msun)
+    T = __strip_unit(orb_per, u.d)
+
+    return __kepler_axis_au(M, T) * u.AU
+
+def orb_per_from_au(st_mass, au):
+    """Returns orbital periods (days) for whole catalogs using Kepler's third law.
+
+    Args:
+        st_mass (array-like or u.Quantity): Stellar masses, e.g. the st_mass column of get_current_parameters (Msun if generic numbers)
+        au (array-like or u.Quantity): Orbit semi-major axes, e.g. the pl_orbsmax column (AU if generic numbers)
+    Returns:
+        np.ndarray: Orbital periods in days, NaN where either input is missing
+    """
+    M = __strip_unit(st_mass, u.Msun)
+    a = __strip_unit(au, u.AU)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return __kepler_period_days(M, a)
+
+def au_from_orb_per(st_mass, orb_per):
+    """Returns orbit semi-major axes (AU) for whole catalogs using Kepler's third law.
+
+    Args:
+        st_mass (array-like or u.Quantity): Stellar masses, e.g. the st_mass column of get_current_parameters (Msun if generic numbers)
+        orb_per (array-like or u.Quantity): Orbital periods, e.g. the pl_orbper column (days if generic numbers)
+    Returns:
+        np.ndarray: Semi-major axes in AU, NaN where either input is missing
+    """
+    M = __strip_unit(st_mass, u.Msun)
+    T = __strip_unit(orb_per, u.d)
+    with np.errstate(invalid='ignore'):
+        return __kepler_axis_au(M, T)
+
+def fill_orbits(df):
+    """Fills in missing pl_orbsmax from pl_orbper (and the reverse) for a whole get_current_parameters table.
+
+    Args:
+        df (pd.DataFrame): Table with st_mass, pl_orbper and pl_orbsmax columns
+    Returns:
+        pd.DataFrame: Copy of df with the missing orbit columns filled where st_mass and the other column are known
+    """
+    df = df.copy()
+    mass = df['st_mass'].to_numpy(dtype=float)
+    per = df['pl_orbper'].to_numpy(dtype=float)
+    smax = df['pl_orbsmax'].to_numpy(dtype=float)
+
+    df['pl_orbsmax'] = np.where(np.isnan(smax), au_from_orb_per(mass, per), smax)
+    df['pl_orbper'] = np.where(np.isnan(per), orb_per_from_au(mass, smax), per)
+    return df
+
+#Kopparapu et al. 2014 (2014ApJ...787L..29K) eqn. 4 coefficients, one row per HZ scenario in HZ_LABELS.
+#Columns are SeffSUN, a, b, c, d.
+HZ_LABELS = ('rv', 'rg0.1', 'rg1', 'rg5', 'mxg', 'em')
+KOPPARAPU_COEFFS = np.array([
+    [1.776000, 2.136000e-04, 2.533000e-08, -1.33200e-11, -3.09700e-15],     # recent venus
+    [9.900000e-01, 1.209000e-04, 1.404000e-08, -7.41800e-12, -1.71300e-15], # runaway greenhouse 0.1 Mearth
+    [1.107, 1.332000e-04, 1.580000e-08, -8.30800e-12, -1.93100e-15],        # runaway greenhouse 1 Mearth
+    [1.188000, 1.433000e-04, 1.707000e-08, -8.96800e-12, -2.08400e-15],     # runaway greenhouse 5 Mearth
+    [3.560000e-01, 6.171000e-05, 1.698000e-09, -3.19800e-12, -5.57500e-16], # maximum greenhouse
+    [3.200000e-01, 5.547000e-05, 1.526000e-09, -2.87400e-12, -5.01100e-16], # early mars
+])
+
+def __kopparapu_seff(T_s):
+    """Helper method evaluating eqn. 4 of Kopparapu 2014 for all six scenarios at once.
+
+    Args:
+        T_s (np.ndarray): Stellar effective temperature minus 5780 K, any shape
+    Returns:
+        np.ndarray: SeffBound with shape T_s.shape + (6,), last axis ordered as HZ_LABELS
+    """
+    tS = np.asarray(T_s, dtype=float)[..., np.newaxis]
+    Seff = KOPPARAPU_COEFFS[:, 4]
+    for k in range(3, -1, -1):
+        Seff = Seff * tS + KOPPARAPU_COEFFS[:, k]
+    return Seff
+
+#Effective temperature range (K) over which the Kopparapu et al. 2014 fits are valid
+KOPPARAPU_TEFF_RANGE = (2600.0, 7200.0)
+DEFAULT_SEFF_GRID_STEP = 1.0 # K
+DEFAULT_SEFF_GRID_DIR = os.path.join(os.path.expanduser('~'), '.hztrak')
+
+class SeffGrid:
+    """Precomputed SeffBound of all six scenarios on a uniform Teff grid, evaluated by linear interpolation.
+
+    Evaluation is constant time per star: the grid cell is found by arithmetic, not by searching. Temperatures
+    outside KOPPARAPU_TEFF_RANGE are flagged invalid instead of being extrapolated.
 
-    a =  (( (T / (2*pi) ) ** 2) * G * M) ** (1/3)
+    The interpolation error of each scenario is at most step**2 / 8 * max|d2 Seff / dTeff2| over the range
+    (the standard bound for linear interpolation), stored per scenario in max_error and relative to the smallest
+    Seff in max_rel_error. For the default 1 K step this is about 2e-8 relative, far inside the fit uncertainties.
 
-    return a.to(u.AU)
+    Args:
+        teff_min (float): first grid temperature (K)
+        step (float): grid spacing (K)
+        table (np.ndarray): SeffBound of shape (n, 6) at teff_min + step * arange(n)
+        max_error (np.ndarray): absolute error bound of each scenario, shape (6,)
+        max_rel_error (float): relative error bound over all scenarios
+        teff_range (tuple): (min, max) temperature (K) flagged valid, within the grid; the last grid point can lie
+            past it when step does not divide the range
+    """
+
+    def __init__(self, teff_min, step, table, max_error, max_rel_error, teff_range=KOPPARAPU_TEFF_RANGE):
+        self.teff_min = float(teff_min)
+        self.step = float(step)
+        self.table = table
+        self.max_error = max_error
+        self.max_rel_error = float(max_rel_error)
+        self.teff_max = self.teff_min + self.step * (len(table) - 1)
+        self.teff_range = (max(float(teff_range[0]), self.teff_min), min(float(teff_range[1]), self.teff_max))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, teff_min=self.teff_min, step=self.step, table=self.table,
+                 max_error=self.max_error, max_rel_error=self.max_rel_error, teff_range=self.teff_range)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        #grids saved before teff_range was stored were all built over KOPPARAPU_TEFF_RANGE
+        teff_range = data['teff_range'] if 'teff_range' in data.files else KOPPARAPU_TEFF_RANGE
+        return cls(data['teff_min'], data['step'], data['table'], data['max_error'], data['max_rel_error'], teff_range)
+
+    def __call__(self, st_teff):
+        """Returns (SeffBound, valid) with shapes st_teff.shape + (6,) and st_teff.shape, NaN where out of range."""
+        teff = np.asarray(st_teff, dtype=float)
+        valid = (teff >= self.teff_range[0]) & (teff <= self.teff_range[1])
+        x = (np.where(valid, teff, self.teff_min) - self.teff_min) / self.step
+        i = np.minimum(x.astype(np.intp), len(self.table) - 2)
+        frac = (x - i)[..., np.newaxis]
+        Seff = self.table[i] * (1 - frac) + self.table[i + 1] * frac
+        Seff[~valid] = np.nan
+        return Seff, valid
+
+def build_seff_grid(step=DEFAULT_SEFF_GRID_STEP, teff_range=KOPPARAPU_TEFF_RANGE):
+    """Evaluates the exact Kopparapu polynomial on a uniform Teff grid and returns it as a SeffGrid.
+
+    Args:
+        step (float): grid spacing (K)
+        teff_range (tuple): (min, max) temperature (K) of the grid
+    Returns:
+        SeffGrid: the grid with its interpolation error bounds
+    """
+    n = int(np.ceil((teff_range[1] - teff_range[0]) / step)) + 1
+    teff = teff_range[0] + step * np.arange(n)
+    table = __kopparapu_seff(teff - 5780)
+
+    #second derivative of eqn. 4: 2b + 6c tS + 12d tS^2, its maximum found on the grid itself
+    tS = teff[:, np.newaxis] - 5780
+    second = 2 * KOPPARAPU_COEFFS[:, 2] + 6 * KOPPARAPU_COEFFS[:, 3] * tS + 12 * KOPPARAPU_COEFFS[:, 4] * tS ** 2
+    max_error = step ** 2 / 8 * np.abs(second).max(axis=0)
+    max_rel_error = (max_error / np.abs(table).min(axis=0)).max()
+
+    return SeffGrid(teff[0], step, table, max_error, max_rel_error, teff_range)
+
+@lru_cache(maxsize=None)
+def load_seff_grid(step=DEFAULT_SEFF_GRID_STEP, cache_dir=DEFAULT_SEFF_GRID_DIR):
+    """Returns the SeffGrid for step, loading it from cache_dir or building and saving it on first use.
+
+    Args:
+        step (float): grid spacing (K)
+        cache_dir (str): directory of the cached grids, or None to always build in memory
+    Returns:
+        SeffGrid: the shared grid for step
+    """
+    if cache_dir is None:
+        return build_seff_grid(step)
+    path = os.path.join(cache_dir, f'seff_grid_{step:g}K.npz')
+    if os.path.exists(path):
+        return SeffGrid.load(path)
+    grid = build_seff_grid(step)
+    grid.save(path)
+    return grid
+
+@timed('hz')
+def find_hz_batch(st_teff, st_lum, grid=None):
+    """Vectorized version of find_hz for many stars at once.
+
+    Evaluates eqn. 4 of Kopparapu et al. 2014 for all six scenarios as a single broadcasted polynomial.
+    Stars whose bounds cannot be computed are flagged in the returned mask instead of raising.
+
+    Args:
+        st_teff (array-like or u.Quantity): Stellar effective temperatures, either as generic numbers or u.K
+        st_lum (array-like or u.Quantity): Stellar luminosities (expected as u.Lsun or equivalent generic numbers), broadcastable against st_teff
+        grid (SeffGrid): if given, interpolate SeffBound from this precomputed grid (see load_seff_grid) instead of
+            evaluating the polynomial; temperatures outside the grid are then flagged invalid
+
+    Returns:
+        tuple: (distances, valid) where distances is an np.ndarray of shape (..., 6) in AU with columns ordered as HZ_LABELS
+        (NaN where invalid) and valid is a boolean np.ndarray of the same shape
+    """
+    T = __strip_unit(st_teff, u.K)
+    L = __strip_unit(st_lum, u.Lsun)
+
+    if grid is None:
+        SeffBound = __kopparapu_seff(T - 5780)
+    else:
+        SeffBound, _ = grid(T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distances = __dist_from_Seff(SeffBound, L[..., np.newaxis])
+    valid = np.isfinite(distances) & (distances > 0)
+    distances = np.where(valid, distances, np.nan)
+
+    return distances, valid
+
+class HZCache:
+    """Bounded LRU cache of habitable zone bounds used by find_hz, keyed on quantized (Teff, L).
+
+    The cache is opt-in: it is disabled while maxsize is 0. Temperatures are quantized to steps of teff_tol (K)
+    and luminosities to steps of lum_tol in log10(L/Lsun); bounds are evaluated at the center of the bin,
+    so every star in a bin gets the same result and the error is bounded by the tolerances.
+
+    Args:
+        maxsize (int): maximum number of stars kept, 0 disables the cache
+        teff_tol (float): temperature quantization step (K)
+        lum_tol (float): luminosity quantization step (dex)
+    """
+
+    def __init__(self, maxsize=0, teff_tol=0.1, lum_tol=1e-5):
+        self.maxsize = maxsize
+        self.teff_tol = teff_tol
+        self.lum_tol = lum_tol
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def info(self):
+        """Returns a dict with the hits, misses, evictions, current size and maxsize of the cache."""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        """Drops all entries and resets the counters."""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def resize(self, maxsize):
+        """Changes maxsize at runtime, evicting the least recently used entries if needed."""
+        self.maxsize = maxsize
+        self.__evict()
+
+    def configure(self, maxsize=None, teff_tol=None, lum_tol=None):
+        """Changes the size and/or tolerances. Changing a tolerance clears the cache."""
+        if (teff_tol is not None and teff_tol != self.teff_tol) or (lum_tol is not None and lum_tol != self.lum_tol):
+            self.teff_tol = teff_tol if teff_tol is not None else self.teff_tol
+            self.lum_tol = lum_tol if lum_tol is not None else self.lum_tol
+            self.clear()
+        if maxsize is not None:
+            self.resize(maxsize)
+
+    def __evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
 
+    def get(self, teff, lum):
+        """Returns the (distances, valid) arrays for a star, computing them on a miss.
+
+        Args:
+            teff (float): Stellar effective temperature (K)
+            lum (float): Stellar luminosity (Lsun)
+        Returns:
+            tuple: read-only distances and valid arrays of shape (6,), as returned by find_hz_batch
+        """
+        if not (np.isfinite(teff) and np.isfinite(lum) and lum > 0):
+            self.misses += 1
+            return find_hz_batch(teff, lum)
+
+        key = (round(teff / self.teff_tol), round(np.log10(lum) / self.lum_tol))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = find_hz_batch(key[0] * self.teff_tol, 10 ** (key[1] * self.lum_tol))
+        for arr in entry:
+            arr.flags.writeable = False
+        self._entries[key] = entry
+        self.__evict()
+        return entry
+
+#Shared cache used by find_hz, enable it with HZ_CACHE.resize(n)
+HZ_CACHE = HZCache()
+
+@timed('hz')
 def find_hz(st_teff, st_lum):
     """Returns the habitable zone bounds as specified by Kopparapu et al. 2014 (2014ApJ...787L..29K) for a given temperature and luminosity. 
     Both optimistic (Recent Venus-Early Mars) and conservative (runaway/maximum greenhouse) bounds are returned.
@@ -98,43 +563,55 @@ def find_hz(st_teff, st_lum):
         st_teff (number or u.Quantity): Stellar effective temperature, either as a generic number or u.K
         st_lum (number or u.Quantity): Steller luminosity (expected as u.Lsun or equivalent generic number)
 
+    Note:
+        Results are memoized when HZ_CACHE is enabled, see HZCache.
+
     Returns:
-        pd.DataFrame: DataFrame containing the max/min distances (AU) from the host star matching (st_teff, st_lum) for each habitable zone scenario calculated in 2014ApJ...787L..29K
+        QTable: Table with columns Label and Distance (AU) from the host star matching (st_teff, st_lum) for each habitable zone scenario calculated in 2014ApJ...787L..29K
+    Raises:
+        RuntimeError: Raised when any of the bounds cannot be computed for the given star
     
     """
+    from astropy.table import QTable
+    if HZ_CACHE.enabled:
+        distances, valid = HZ_CACHE.get(float(__strip_unit(st_teff, u.K)), float(__strip_unit(st_lum, u.Lsun)))
+    else:
+        distances, valid = find_hz_batch(st_teff, st_lum)
+    if not valid.all():
+        raise RuntimeError("Star temperature/luminosity too high")
 
-    def KopparapuEqnFour(SeffSUN, a, b, c, d, tS):
-        Seff = SeffSUN + a * tS + b * ((tS) ** 2) + c * ((tS) ** 3) + d * ((tS) ** 4)
-        return Seff
-    
-    L = __ensure_unit(st_lum, u.Lsun)
-    T_s = __ensure_unit(st_teff, u.K) - 5780 * u.K
-    
-    recent_venus = {'label': 'rv', 'Seff': 1.776000 , 'a': 2.136000e-04 , 'b': 2.533000e-08, 'c': -1.33200e-11, 'd': -3.09700e-15}
-    runaway_greenhouse_1Mearth = {'label': 'rg1', 'Seff': 1.107, 'a': 1.332000e-04 , 'b': 1.580000e-08, 'c': -8.30800e-12, 'd': -1.93100e-15}
-    maximum_greenhouse = {'label': 'mxg', 'Seff': 3.560000e-01, 'a': 6.171000e-05 , 'b': 1.698000e-09, 'c': -3.19800e-12, 'd': -5.57500e-16}
-    early_mars = {'label': 'em', 'Seff': 3.200000e-01, 'a': 5.547000e-05 , 'b': 1.526000e-09, 'c': -2.87400e-12, 'd': -5.01100e-16}
-    runaway_greenhouse_5Mearth = {'label': 'rg5', 'Seff': 1.188000, 'a': 1.433000e-04 , 'b': 1.707000e-08, 'c': -8.96800e-12, 'd': -2.08400e-15}
-    runaway_greenhouse_01Mearth = {'label': 'rg0.1', 'Seff': 9.900000e-01, 'a': 1.209000e-04 , 'b': 1.404000e-08, 'c': -7.41800e-12, 'd': -1.71300e-15}
-    
-    coeff_matrix = pd.DataFrame([recent_venus, runaway_greenhouse_01Mearth, runaway_greenhouse_1Mearth, 
-                                 runaway_greenhouse_5Mearth, maximum_greenhouse, early_mars])
+    t = QTable([list(HZ_LABELS)], names=['Label'])
+    t['Distance'] = np.ravel(distances) * u.AU
 
+    return t
 
-    #Add column with the result of eqn. 4 in Kopparapu 2014
-    
-    for index, row in coeff_matrix.iterrows():
-        
-        SeffBound = KopparapuEqnFour(row['Seff'], row['a'], row['b'], row['c'], row['d'], T_s.value)
-        coeff_matrix.at[index,'SeffBound'] = SeffBound
-        distau = __dist_from_Seff(SeffBound, L.value)
-        
-        if distau  > 0: 
-           coeff_matrix.at[index,'distance'] = distau
-        else:
-            raise RuntimeError("Star temperature/luminosity too high")
 
-    t = QTable([coeff_matrix['label']], names=['Label'])
-    t['Distance'] = (list(coeff_matrix['distance']) * u.AU) 
-    
-    return t
\ No newline at end of file
+#Categories of classify_catalog, stored as int8 codes in this order (-1 when the class cannot be computed)
+HZ_CLASSES = ('too hot', 'optimistic', 'conservative', 'too cold')
+
+def classify_catalog(df):
+    """Classifies every planet of a get_current_parameters table against its host's habitable zone.
+
+    Orbits missing pl_orbsmax are filled from pl_orbper. A planet is 'conservative' between the runaway
+    (rg1) and maximum greenhouse (mxg) bounds, 'optimistic' between recent Venus (rv) and early Mars (em)
+    but outside the conservative zone, and 'too hot'/'too cold' inside rv/beyond em.
+
+    Args:
+        df (pd.DataFrame): Table with st_teff, st_lum [log10(Solar)], st_mass, pl_orbper and pl_orbsmax columns
+    Returns:
+        pd.DataFrame: Copy of df with filled pl_orbsmax, an hz_class categorical (int8 codes over HZ_CLASSES)
+        and hz_position, the float32 position of the orbit in the conservative zone (0 at rg1, 1 at mxg)
+    """
+    import pandas as pd
+    df = fill_orbits(df)
+    a = df['pl_orbsmax'].to_numpy(dtype=float)
+    distances, valid = find_hz_batch(df['st_teff'].to_numpy(dtype=float), 10 ** df['st_lum'].to_numpy(dtype=float))
+    rv, rg1, mxg, em = (distances[:, HZ_LABELS.index(label)] for label in ('rv', 'rg1', 'mxg', 'em'))
+
+    codes = np.select([a < rv, a > em, (a >= rg1) & (a <= mxg)], [0, 3, 2], default=1).astype(np.int8)
+    codes[np.isnan(a) | ~valid.all(axis=1)] = -1
+
+    df['hz_class'] = pd.Categorical.from_codes(codes, categories=HZ_CLASSES)
+    with np.errstate(invalid='ignore'):
+        df['hz_position'] = ((a - rg1) / (mxg - rg1)).astype(np.float32)
+    return df
@@ -1,15 +1,9 @@
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-from hztrak.core import get_current_parameters
-from astropy.table import Table
 from astropy import units as u
-from astropy.constants import L_sun
-from core import find_hz
-import core
+from hztrak import core
+from hztrak.instrument import timed
+from hztrak.core import get_current_parameters, find_hz_batch, HZ_LABELS
+#matplotlib and astropy.table are imported inside the functions that need them to keep the import free of side effects
 
 '''
 def get_queried_star_from_user():
@@ -46,6 +40,10 @@ def get_queried_star_from_user():
     return queried_star
 
 
+def __strip_unit(x, unit):
+    """Helper method returning x as a plain value in unit, so Quantities and generic numbers can both be passed."""
+    return x.to_value(unit) if isinstance(x, u.Quantity) else x
+
 def alpha_beta_gamma(mass):
     ''' Alpha Beta Gamma Params
 
@@ -53,11 +51,12 @@ def alpha_beta_gamma(mass):
     depending on the mass of the queried star 
 
     Args:
-        mass (int): mass of selected star for stellar evolution
+        mass (float or u.Quantity): mass of selected star for stellar evolution, in Msun if a generic number
     
     Returns: 
         int: alpha, beta, gamma
     '''
+    mass = __strip_unit(mass, u.Msun)
     if mass < 0.43:
         alpha = 2.3
         beta = 0.1
@@ -79,6 +78,33 @@ def alpha_beta_gamma(mass):
     
     return alpha, beta, gamma
 
+#Mass breaks (Msun) and the alpha, beta, gamma of each mass bin, as in alpha_beta_gamma
+MASS_BREAKS = np.array([0.43, 2.0, 20.0])
+ALPHA_BINS = np.array([2.3, 4, 3.5, 1.0])
+BETA_BINS = np.array([0.1, 0.4, 0.7, 0.9])
+GAMMA_BINS = np.array([0.05, 0.1, 0.2, 0.3])
+
+def alpha_beta_gamma_batch(mass):
+    ''' Alpha Beta Gamma Params for many stars
+
+    Vectorized version of alpha_beta_gamma using a lookup on the mass breaks.
+
+    Args:
+        mass (array-like): masses of the stars in Msun
+    
+    Returns: 
+        np.ndarray: alpha, beta, gamma arrays with the shape of mass, NaN where the mass is not a number
+    '''
+    mass = np.asarray(mass, dtype=float)
+    idx = np.searchsorted(MASS_BREAKS, mass, side='right')
+    nan = np.isnan(mass)
+    idx[nan] = 0
+
+    alpha, beta, gamma = ALPHA_BINS[idx], BETA_BINS[idx], GAMMA_BINS[idx]
+    alpha[nan] = beta[nan] = gamma[nan] = np.nan
+
+    return alpha, beta, gamma
+
 def luminosity_evolve(L_0, beta, t_f, t, alpha):
     ''' 
     Evolve Luminosity
@@ -138,124 +164,344 @@ def temp_evolve(T_0, L_f, L_0, R_f, R_0):
     T_f = T_0 * (L_f / L_0)**(1/4) * (R_f / R_0)**(-1/2)
     return T_f
 
-def evolve_star(L_0, R_0, T_0, mass, t_f=1e10, steps=10):
+#Fields of the track returned by evolve_star
+EVOLUTION_DTYPE = np.dtype([('time_yr', 'f8'), ('luminosity_Lsun', 'f8'), ('radius_Rsun', 'f8'), ('temperature_K', 'f8')])
+
+@timed('evolve')
+def evolve_star(L_0, R_0, T_0, mass, t_f=1e10, steps=10, as_table=False):
     """
     Evolve star 
 
-    Evolve the star's L, R, and T over time and return numpy arrays.
+    Evolve the star's L, R, and T over time. All timesteps are computed in one broadcasted expression.
 
     Args:
-        L_0 (int): inital luminosity
-        R_0 (int): initial radius
-        T_0 (int): initial temperature
-        mass (int): mass of selected star for stellar evolution
-        t_f (int): end time user wishes to evolve to
+        L_0 (float or u.Quantity): inital luminosity (Lsun)
+        R_0 (float or u.Quantity): initial radius (Rsun)
+        T_0 (float or u.Quantity): initial temperature (K)
+        mass (float or u.Quantity): mass of selected star for stellar evolution (Msun)
+        t_f (float or u.Quantity): end time user wishes to evolve to
         steps (int): number of intervals in t_f
+        as_table (bool): return an astropy Table instead of a structured array
 
     Returns:
-        arrays for time, luminosity, radius, and temp
+        np.ndarray: structured array with EVOLUTION_DTYPE fields time_yr, luminosity_Lsun, radius_Rsun and temperature_K,
+        or an astropy Table with the same columns and units attached when as_table is True
 
     """
+    time_unit = t_f.unit if isinstance(t_f, u.Quantity) else None
+    L_0 = __strip_unit(L_0, u.Lsun)
+    R_0 = __strip_unit(R_0, u.Rsun)
+    T_0 = __strip_unit(T_0, u.K)
+    t_f = __strip_unit(t_f, time_unit)
+
     alpha, beta, gamma = alpha_beta_gamma(mass)
     times = np.linspace(0, t_f, steps)  # times has same unit as t_f
-    
-    L_vals = []
-    R_vals = []
-    T_vals = []
 
-    for t in times:
-        L_t = luminosity_evolve(L_0, beta, t_f, t, alpha)
-        R_t = radius_evolve(R_0, gamma, t_f, t, alpha)
-        T_t = temp_evolve(T_0, L_t, L_0, R_t, R_0)
+    L_vals = luminosity_evolve(L_0, beta, t_f, times, alpha)
+    R_vals = radius_evolve(R_0, gamma, t_f, times, alpha)
+    T_vals = temp_evolve(T_0, L_vals, L_0, R_vals, R_0)
 
-        L_vals.append(L_t)
-        R_vals.append(R_t)
-        T_vals.append(T_t)
+    track = np.empty(steps, dtype=EVOLUTION_DTYPE)
+    track['time_yr'] = times
+    track['luminosity_Lsun'] = L_vals
+    track['radius_Rsun'] = R_vals
+    track['temperature_K'] = T_vals
 
-    #return np.array(times), np.array(L_vals), np.array(R_vals), np.array(T_vals)
+    if as_table:
+        from astropy.table import Table
+        units = {'luminosity_Lsun': u.Lsun, 'radius_Rsun': u.Rsun, 'temperature_K': u.K}
+        if time_unit is not None:
+            units['time_yr'] = time_unit
+        return Table(track, units=units)
+    return track
 
-    # Build and return astropy table
-    table = Table(
-        [times, L_vals, R_vals, T_vals],
-        names=('time_yr', 'luminosity_Lsun', 'radius_Rsun', 'temperature_K')
-    )
-    return table
 
+def iter_population(L_0, R_0, T_0, mass, t_f=1e10, steps=10, chunk_size=100000):
+    """
+    Iterate over the evolution of a population in chunks of stars
 
-# ------ USE w query -------
-#if __name__ == "__main__":
+    Evolves chunk_size stars at a time so the temporary arrays never exceed chunk_size * steps elements.
 
-#model = calc()
+    Args:
+        L_0 (array-like): inital luminosities
+        R_0 (array-like): initial radii
+        T_0 (array-like): initial temperatures
+        mass (array-like): masses of the stars
+        t_f (float): end time shared by all stars
+        steps (int): number of intervals in t_f
+        chunk_size (int): number of stars evolved at once
 
-star = get_queried_star_from_user()
+    Yields:
+        tuple: (slice of the stars in the chunk, L, R, T) with L, R, T of shape (chunk, steps)
+    """
+    L_0, R_0, T_0, mass = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float)) for x in (L_0, R_0, T_0, mass)))
+    times = np.linspace(0, t_f, steps)
 
-# use 'results' for astropy table of the floats
-results = evolve_star(
-L_0=star['st_lum'],
-R_0=star['st_rad'],
-T_0=star['st_teff'],
-mass=star['st_mass'],
-t_f=star['st_age'],
-steps=10
-)
+    for start in range(0, len(mass), chunk_size):
+        sl = slice(start, start + chunk_size)
+        alpha, beta, gamma = alpha_beta_gamma_batch(mass[sl])
+        L = luminosity_evolve(L_0[sl, np.newaxis], beta[:, np.newaxis], t_f, times, alpha[:, np.newaxis])
+        R = radius_evolve(R_0[sl, np.newaxis], gamma[:, np.newaxis], t_f, times, alpha[:, np.newaxis])
+        T = temp_evolve(T_0[sl, np.newaxis], L, L_0[sl, np.newaxis], R, R_0[sl, np.newaxis])
 
-for row in results:
-    print(f"t = {row['time_yr']:.1f} Gyr | L = {row['luminosity_Lsun']:.3f} L☉ | "
-        f"R = {row['radius_Rsun']:.3f} R☉ | T = {row['temperature_K']:.1f} K")
+        yield sl, L, R, T
 
-#print(results)  #astropy table print formatted
+@timed('evolve')
+def evolve_population(L_0, R_0, T_0, mass, t_f=1e10, steps=10, chunk_size=None, out=None):
+    """
+    Evolve population
 
-frames = {} #Keys are the time stamp, the values are the hz bounds
+    Evolve many stars over a shared time grid in one call.
 
-for row in results:
-    t = row['time_yr']
-    t_eff = row['temperature_K']
-    st_lum = row['luminosity_Lsun']
-    
+    Args:
+        L_0 (array-like): inital luminosities
+        R_0 (array-like): initial radii
+        T_0 (array-like): initial temperatures
+        mass (array-like): masses of the stars
+        t_f (float): end time shared by all stars
+        steps (int): number of intervals in t_f
+        chunk_size (int): evolve this many stars at a time to cap peak memory, None evolves all at once
+        out (tuple): optional (L, R, T) arrays of shape (N_stars, steps) to write into, e.g. np.memmap
 
-    hz_found = find_hz(st_lum=st_lum, st_teff=t_eff)
-    
-    frames[t] = hz_found
+    Returns:
+        tuple: times of shape (steps,) and L, R, T arrays of shape (N_stars, steps)
+    """
+    n = np.broadcast(*(np.atleast_1d(x) for x in (L_0, R_0, T_0, mass))).shape[0]
+    if out is None:
+        out = tuple(np.empty((n, steps)) for _ in range(3))
+    L_out, R_out, T_out = out
+
+    for sl, L, R, T in iter_population(L_0, R_0, T_0, mass, t_f, steps, chunk_size or max(n, 1)):
+        L_out[sl] = L
+        R_out[sl] = R
+        T_out[sl] = T
+
+    return np.linspace(0, t_f, steps), L_out, R_out, T_out
 
 
-def visualize_1(f, planet_AU):
+#Fields of the track returned by hz_track: the evolution plus one distance (AU) per Kopparapu scenario
+HZ_TRACK_DTYPE = np.dtype(EVOLUTION_DTYPE.descr + [(f'{label}_AU', 'f8') for label in HZ_LABELS])
+
+def hz_track(star, t_f=None, steps=10, tol=None):
+    """
+    Habitable zone track
+
+    Evolve the star and compute its habitable zone bounds at every timestep in one NumPy pass.
+
+    Args:
+        star (dict): host star parameters with keys st_lum (Lsun), st_rad, st_teff and st_mass, as returned by get_queried_star_from_user
+        t_f (float): end time user wishes to evolve to, defaults to star['st_age']
+        steps (int): number of intervals in t_f, or of the initial grid when tol is given
+        tol (float): if given, place samples adaptively with evolve_star_adaptive at this relative tolerance
+
+    Returns:
+        np.ndarray: structured array with HZ_TRACK_DTYPE fields, i.e. the evolve_star fields followed by
+        rv_AU, rg0.1_AU, rg1_AU, rg5_AU, mxg_AU and em_AU (NaN where a bound cannot be computed)
+    """
+    if t_f is None:
+        t_f = star['st_age']
+    if tol is not None:
+        track, _ = evolve_star_adaptive(star['st_lum'], star['st_rad'], star['st_teff'], star['st_mass'], t_f=t_f, tol=tol, initial_steps=steps)
+        return track
+    evolution = evolve_star(star['st_lum'], star['st_rad'], star['st_teff'], star['st_mass'], t_f=t_f, steps=steps)
+    distances, _ = find_hz_batch(evolution['temperature_K'], evolution['luminosity_Lsun'])
+
+    track = np.empty(steps, dtype=HZ_TRACK_DTYPE)
+    for name in EVOLUTION_DTYPE.names:
+        track[name] = evolution[name]
+    for i, label in enumerate(HZ_LABELS):
+        track[f'{label}_AU'] = distances[:, i]
+
+    return track
+
+
+@timed('evolve')
+def evolve_star_adaptive(L_0, R_0, T_0, mass, t_f=1e10, tol=1e-3, initial_steps=5, max_steps=100000):
+    """
+    Evolve star adaptively
+
+    Evolve the star on a non-uniform time grid. Starting from a uniform grid of initial_steps, every interval whose
+    midpoint differs from the linear interpolation of its ends by more than tol (relative) in L, T or any of the
+    habitable zone bounds is split in two, until all intervals pass or max_steps samples are reached.
+    The (t/t_f)**alpha laws are flat early and steep late, so samples end up concentrated near t_f.
+
+    Args:
+        L_0 (float): inital luminosity (Lsun)
+        R_0 (float): initial radius (Rsun)
+        T_0 (float): initial temperature (K)
+        mass (float): mass of selected star for stellar evolution (Msun)
+        t_f (float): end time user wishes to evolve to
+        tol (float): relative tolerance on the interpolation error of L, T and the HZ bounds
+        initial_steps (int): number of samples of the starting uniform grid
+        max_steps (int): maximum number of samples
+
+    Returns:
+        tuple: structured array with HZ_TRACK_DTYPE fields at the adaptive times, and a dict with the number of
+        model evaluations, the uniform_steps a uniform grid at the finest spacing would need, and the evaluations saved
+    """
+    alpha, beta, gamma = alpha_beta_gamma(mass)
+
+    def evaluate(t):
+        L = luminosity_evolve(L_0, beta, t_f, t, alpha)
+        R = radius_evolve(R_0, gamma, t_f, t, alpha)
+        T = temp_evolve(T_0, L, L_0, R, R_0)
+        distances, _ = find_hz_batch(T, L)
+        return np.column_stack([L, R, T, distances])
+
+    times = np.linspace(0, t_f, initial_steps)
+    values = evaluate(times)
+    evaluations = len(times)
+    active = np.ones(len(times) - 1, dtype=bool)
+
+    while active.any() and len(times) < max_steps:
+        idx = np.flatnonzero(active)[:max_steps - len(times)]
+        mid_times = (times[idx] + times[idx + 1]) / 2
+        mid_values = evaluate(mid_times)
+        evaluations += len(idx)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            error = np.abs(mid_values - (values[idx] + values[idx + 1]) / 2) / np.abs(mid_values)
+        split_again = np.nanmax(np.where(np.isfinite(error), error, 0.0), axis=1) > tol
+
+        # each checked interval is split in two, its halves stay active only if it failed the tolerance
+        times = np.insert(times, idx + 1, mid_times)
+        values = np.insert(values, idx + 1, mid_values, axis=0)
+        active[idx] = split_again
+        active = np.insert(active, idx + 1, split_again)
+
+    track = np.empty(len(times), dtype=HZ_TRACK_DTYPE)
+    track['time_yr'] = times
+    track['luminosity_Lsun'] = values[:, 0]
+    track['radius_Rsun'] = values[:, 1]
+    track['temperature_K'] = values[:, 2]
+    for i, label in enumerate(HZ_LABELS):
+        track[f'{label}_AU'] = values[:, 3 + i]
+
+    uniform_steps = int(np.ceil(t_f / np.min(np.diff(times)))) + 1 if len(times) > 1 else len(times)
+    stats = {'evaluations': evaluations, 'uniform_steps': uniform_steps, 'saved': uniform_steps - evaluations}
+
+    return track, stats
+
+
+#Habitable zones as (inner, outer) scenario pairs of Kopparapu et al. 2014
+HZ_ZONES = {
+    'optimistic': ('rv', 'em'),
+    'conservative': ('rg1', 'mxg'),
+    'conservative_0.1': ('rg0.1', 'mxg'),
+    'conservative_5': ('rg5', 'mxg'),
+}
+
+def __nonnegative_fraction(f0, f1):
+    """Helper method returning the part [lo, hi] of each unit interval where a linear function from f0 to f1 is >= 0.
+
+    Empty parts are returned with lo > hi.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        root = f0 / (f0 - f1)
+    lo = np.where(f0 >= 0, 0.0, np.where(f1 >= 0, root, 1.0))
+    hi = np.where(f1 >= 0, 1.0, np.where(f0 >= 0, root, 0.0))
+    empty = ~((f0 >= 0) | (f1 >= 0))
+    return np.where(empty, 1.0, lo), np.where(empty, 0.0, hi)
+
+def time_in_hz(track, planet_au):
+    """
+    Time in habitable zone
+
+    Finds when planets enter and leave each zone in HZ_ZONES and how long they stay inside.
+    Boundary crossings are found by linear interpolation between the grid points of the track,
+    so a coarse steps grid still gives accurate durations.
+
+    Args:
+        track (np.ndarray): track from hz_track with shape (steps,), or (N, steps) for one host per planet
+        planet_au (array-like): orbit semi-major axes (AU), shape (N,) or a single value
+
+    Returns:
+        np.ndarray: structured array of shape (N,) with fields <zone>_entry, <zone>_exit and <zone>_time for every zone
+        in HZ_ZONES, in the time unit of the track. Entry is the first entry and exit the last exit, time is the total
+        time inside (time spent outside between them is not counted). Entry and exit are NaN if the planet is never inside.
+        All three are NaN when the answer is unknown: the planet distance is NaN, or the track has no times or no
+        bounds of the zone.
+    """
+    a = np.atleast_1d(np.asarray(planet_au, dtype=float))[:, np.newaxis]
+    times = track['time_yr']
+    dt = np.diff(times, axis=-1)
+
+    result = np.empty(np.broadcast_shapes(a.shape[:1], times.shape[:-1]),
+                      dtype=[(f'{zone}_{field}', 'f8') for zone in HZ_ZONES for field in ('entry', 'exit', 'time')])
+    for zone, (inner, outer) in HZ_ZONES.items():
+        f_in = np.nan_to_num(a - track[f'{inner}_AU'], nan=-1.0)   # >= 0 when outside the inner edge
+        f_out = np.nan_to_num(track[f'{outer}_AU'] - a, nan=-1.0)  # >= 0 when inside the outer edge
+        lo_in, hi_in = __nonnegative_fraction(f_in[..., :-1], f_in[..., 1:])
+        lo_out, hi_out = __nonnegative_fraction(f_out[..., :-1], f_out[..., 1:])
+        lo = np.maximum(lo_in, lo_out)
+        hi = np.minimum(hi_in, hi_out)
+        inside = hi > lo
+
+        any_inside = inside.any(axis=-1)
+        first = np.argmax(inside, axis=-1)
+        last = inside.shape[-1] - 1 - np.argmax(inside[..., ::-1], axis=-1)
+        start = np.broadcast_to(times[..., :-1] + dt * lo, inside.shape)
+        stop = np.broadcast_to(times[..., :-1] + dt * hi, inside.shape)
+
+        result[f'{zone}_entry'] = np.where(any_inside, np.take_along_axis(start, first[..., np.newaxis], axis=-1)[..., 0], np.nan)
+        result[f'{zone}_exit'] = np.where(any_inside, np.take_along_axis(stop, last[..., np.newaxis], axis=-1)[..., 0], np.nan)
+        result[f'{zone}_time'] = np.sum(np.where(inside, dt * (hi - lo), 0.0), axis=-1)
+
+        unknown = (np.isnan(a[:, 0]) | np.isnan(times).all(axis=-1)
+                   | np.isnan(track[f'{inner}_AU']).all(axis=-1) | np.isnan(track[f'{outer}_AU']).all(axis=-1))
+        for field in ('entry', 'exit', 'time'):
+            result[f'{zone}_{field}'] = np.where(unknown, np.nan, result[f'{zone}_{field}'])
+
+    return result
+
+
+@timed('plot')
+def visualize_1(track, planet_AU):
     """Visualization_1
 
     Plot the evolution of the habitable zone over time.
 
     Args:
-        f (dictionary): Columns are time, and "values," a collection of habitable zone boundaries found in Kopparapu et al. 2014
+        track (np.ndarray): Habitable zone track from hz_track, the conservative bounds (rg1_AU, mxg_AU) found in Kopparapu et al. 2014 are plotted
 
         planet_AU (list): List of planet distances from star in AU
     
     Returns:
         fig, ax
     """
-    
-    df = pd.DataFrame(f.items(), columns=['time', 'values'])
+    from hztrak.plotting import visualize_track
 
-    hz_in_list = []
-    hz_out_list = []
-    for i in range(len(df)):
-        hz_in_list.append(df['values'][i][2][1]/u.AU)
-        hz_out_list.append(df['values'][i][4][1]/u.AU)
+    return visualize_track(track, planet_AU, zones=('conservative',))
 
-    fig, ax = plt.subplots(figsize = (12,7))
-    ax.fill_between(df["time"], hz_in_list, y2= hz_out_list, color = 'green', alpha = 0.4)
-     
-    for i in planet_AU:
-        ax.axhline(y=i, color='k', linestyle='--')
 
-    ax.set_title("Habitable Zone over Time")
-    ax.set_xlabel(f"Time (Gyr)")
-    ax.set_ylabel(f"Distance from Star (AU)")
+def main():
+    """Prompt for a planet, print its host's evolution and plot the habitable zone over time."""
+    import matplotlib.pyplot as plt
 
-    return fig, ax
+    star = get_queried_star_from_user()
 
-input_planet_orbper = star['pl_orbper']
-input_planet_au = core.__au_from_orb_per(star['st_mass'], input_planet_orbper)
-fig_final, ax_final = visualize_1(frames, [input_planet_au.value])
-plt.show()
+    # use 'results' for the structured array of the floats
+    results = evolve_star(
+    L_0=star['st_lum'],
+    R_0=star['st_rad'],
+    T_0=star['st_teff'],
+    mass=star['st_mass'],
+    t_f=star['st_age'],
+    steps=10
+    )
+
+    for row in results:
+        print(f"t = {row['time_yr']:.1f} Gyr | L = {row['luminosity_Lsun']:.3f} L☉ | "
+            f"R = {row['radius_Rsun']:.3f} R☉ | T = {row['temperature_K']:.1f} K")
 
+    track = hz_track(star, steps=10) #Evolution plus the hz bounds at every time stamp
 
+    input_planet_orbper = star['pl_orbper']
+    input_planet_au = core.au_from_orb_per(star['st_mass'], input_planet_orbper)
+    fig_final, ax_final = visualize_1(track, [input_planet_au])
+    plt.show()
 
+
+# ------ USE w query -------
+if __name__ == "__main__":
+    main()
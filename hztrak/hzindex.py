@@ -0,0 +1,179 @@
+import numpy as np
+
+from hztrak.evol_calc import HZ_ZONES
+
+#Ages the index resolves, queries are snapped to the nearest one: 0 to 14 Gyr every 0.1 Gyr, in Gyr like the
+#tracks of pipeline runs, whose time axis ends at the archive's st_age [Gyr]
+DEFAULT_INDEX_AGES = np.linspace(0, 14, 141)
+
+
+class HZIndex:
+    """Reverse lookup of the hosts whose habitable zone covers a distance at a given age.
+
+    Every host track is sampled on a shared age grid. For each grid age the inner and outer HZ edges of all hosts are
+    kept as sorted arrays, so for a query interval [lo, hi] the hosts whose zone overlaps it are counted with two
+    binary searches, O(log n):
+
+        n - #(inner > hi) - #(outer < lo)
+
+    (the two sets are disjoint since inner <= outer). Listing the hosts takes the shorter of the two candidate runs
+    of the sorted arrays and filters it. Hosts added later are merged into the sorted arrays without rebuilding them.
+    Ages that a host's track does not cover count as outside its zone. Ages are in the unit of the time_yr field of
+    the tracks, Gyr for tracks of pipeline runs; pass ages in years for tracks evolved over years.
+
+    Args:
+        ages (array-like): increasing grid of ages the index resolves, in the time unit of the tracks
+        zone (str): scenario of evol_calc.HZ_ZONES whose edges are indexed
+    """
+
+    def __init__(self, ages=DEFAULT_INDEX_AGES, zone='conservative'):
+        if zone not in HZ_ZONES:
+            raise ValueError(f"zone must be one of {list(HZ_ZONES)}")
+        self.ages = np.asarray(ages, dtype=float)
+        self.zone = zone
+        self.hosts = []
+        self._rows = {}
+        #Edges of each host at each age (H, B), +inf where unknown so unknown hosts always count as too far
+        self.inner = np.empty((0, len(self.ages)))
+        self.outer = np.empty((0, len(self.ages)))
+        #Per age, the edges sorted over the hosts and the host rows in that order (B, H)
+        self._inner_sorted, self._inner_order = np.empty((len(self.ages), 0)), np.empty((len(self.ages), 0), dtype=np.intp)
+        self._outer_sorted, self._outer_order = np.empty((len(self.ages), 0)), np.empty((len(self.ages), 0), dtype=np.intp)
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def __contains__(self, host):
+        return host in self._rows
+
+    def __edges(self, track):
+        """Inner and outer edges of one track on the age grid, +inf where the track has no value."""
+        inner_label, outer_label = HZ_ZONES[self.zone]
+        time = np.asarray(track['time_yr'], dtype=float)
+        edges = np.full((2, len(self.ages)), np.inf)
+        if len(time) == 0 or not np.isfinite(time).all():
+            return edges
+        for k, label in enumerate((inner_label, outer_label)):
+            edges[k] = np.interp(self.ages, time, track[f'{label}_AU'], left=np.nan, right=np.nan)
+        edges[:, ~np.isfinite(edges).all(axis=0)] = np.inf
+        return edges
+
+    @staticmethod
+    def __merge(values, order, new_values, first_row):
+        """Merge new (B, m) edges of rows first_row... into sorted (B, n) arrays.
+
+        The stable sort finds the already sorted run of old edges, so this costs O(n + m log m) per age.
+        """
+        rows = np.broadcast_to(np.arange(first_row, first_row + new_values.shape[1]), new_values.shape)
+        values = np.concatenate([values, new_values], axis=1)
+        order = np.concatenate([order, rows], axis=1)
+        merge = np.argsort(values, axis=1, kind='stable')
+        return np.take_along_axis(values, merge, axis=1), np.take_along_axis(order, merge, axis=1)
+
+    def __insert(self, hosts, inner, outer):
+        first_row = len(self.hosts)
+        self._inner_sorted, self._inner_order = self.__merge(self._inner_sorted, self._inner_order, inner.T, first_row)
+        self._outer_sorted, self._outer_order = self.__merge(self._outer_sorted, self._outer_order, outer.T, first_row)
+        self.inner = np.concatenate([self.inner, inner])
+        self.outer = np.concatenate([self.outer, outer])
+        for host in hosts:
+            self._rows[host] = len(self.hosts)
+            self.hosts.append(host)
+
+    def add(self, tracks):
+        """Index more hosts.
+
+        Args:
+            tracks (iterable): (host, track) pairs, e.g. from pipeline.iter_system_tracks, with hz_track tracks
+        Returns:
+            int: number of hosts added
+        Raises:
+            ValueError: if a host is already indexed
+        """
+        hosts, edges = [], []
+        for host, track in tracks:
+            host = str(host)
+            if host in self._rows or host in hosts:
+                raise ValueError(f"{host} is already in the index")
+            hosts.append(host)
+            edges.append(self.__edges(track))
+        if len(hosts) == 0:
+            return 0
+        edges = np.array(edges)
+        self.__insert(hosts, edges[:, 0], edges[:, 1])
+        return len(hosts)
+
+    def __bins(self, age):
+        """Nearest grid age of every query age, and whether the age is within the grid."""
+        age = np.asarray(age, dtype=float)
+        i = np.clip(np.searchsorted(self.ages, age), 1, len(self.ages) - 1)
+        i = np.where(age - self.ages[i - 1] <= self.ages[i] - age, i - 1, i)
+        return i, (age >= self.ages[0]) & (age <= self.ages[-1])
+
+    def __queries(self, distance, age, distance_max):
+        lo, hi, age = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in
+                                            (distance, distance if distance_max is None else distance_max, age)))
+        bins, inside = self.__bins(age)
+        return lo, hi, bins, inside & np.isfinite(lo) & np.isfinite(hi)
+
+    def count(self, distance, age, distance_max=None):
+        """Count the hosts whose zone at age overlaps [distance, distance_max], or contains distance.
+
+        Vectorized, all arguments broadcast against each other.
+
+        Args:
+            distance (array-like): distance from the star (AU), the lower end of the interval with distance_max
+            age (array-like): age in the time unit of the tracks, snapped to the nearest age of the grid
+            distance_max (array-like): upper end of the distance interval (AU)
+        Returns:
+            np.ndarray: number of hosts, with the broadcast shape of the arguments
+        """
+        lo, hi, bins, ok = self.__queries(distance, age, distance_max)
+        counts = np.zeros(lo.shape, dtype=np.int64)
+        n = len(self.hosts)
+        for b in np.unique(bins[ok]):
+            sel = ok & (bins == b)
+            too_far = n - np.searchsorted(self._inner_sorted[b], hi[sel], side='right')
+            too_close = np.searchsorted(self._outer_sorted[b], lo[sel], side='left')
+            counts[sel] = n - too_far - too_close
+        return counts
+
+    def query(self, distance, age, distance_max=None):
+        """Hosts whose zone at age overlaps [distance, distance_max], or contains distance.
+
+        Args:
+            distance (array-like): distance from the star (AU), the lower end of the interval with distance_max
+            age (array-like): age in the time unit of the tracks, snapped to the nearest age of the grid
+            distance_max (array-like): upper end of the distance interval (AU)
+        Returns:
+            list: host names in the order they were added, or for array arguments a list of such lists in
+            flattened broadcast order
+        """
+        lo, hi, bins, ok = self.__queries(distance, age, distance_max)
+        n = len(self.hosts)
+        results = []
+        for lo_q, hi_q, b, ok_q in zip(lo.ravel(), hi.ravel(), bins.ravel(), ok.ravel()):
+            if not ok_q:
+                results.append([])
+                continue
+            near = np.searchsorted(self._inner_sorted[b], hi_q, side='right')   # inner <= hi for the first near
+            far = np.searchsorted(self._outer_sorted[b], lo_q, side='left')     # outer >= lo from far on
+            if near <= n - far:
+                rows = self._inner_order[b, :near]
+                rows = rows[self.outer[rows, b] >= lo_q]
+            else:
+                rows = self._outer_order[b, far:]
+                rows = rows[self.inner[rows, b] <= hi_q]
+            results.append([self.hosts[r] for r in np.sort(rows)])
+        return results[0] if lo.ndim == 0 else results
+
+    def save(self, path):
+        np.savez(path, ages=self.ages, zone=self.zone, hosts=np.array(self.hosts, dtype=str),
+                 inner=self.inner, outer=self.outer)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls(data['ages'], str(data['zone']))
+        index.__insert(data['hosts'].tolist(), data['inner'], data['outer'])
+        return index
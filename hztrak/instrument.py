@@ -0,0 +1,108 @@
+"""Opt-in instrumentation of the hztrak hot paths.
+
+Functions are tagged with a stage (fetch, evolve, hz, plot). While enabled, the outermost call of a stage adds to its
+call count, cumulative time and (with track_memory) allocated bytes in STATS. While disabled the wrappers only check a flag.
+"""
+import json
+import time
+import tracemalloc
+from functools import wraps
+from contextlib import contextmanager
+
+STAGES = ('fetch', 'evolve', 'hz', 'plot')
+
+
+class Stats:
+    """Per-stage call counts, cumulative time (s) and allocated bytes."""
+
+    def __init__(self):
+        self.enabled = False
+        self.track_memory = False
+        self.stages = {}
+        self._active = []   # [stage, start memory, peak memory] of the stages currently running
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        self.stages = {}
+
+    def record(self, stage, elapsed, allocated=0):
+        entry = self.stages.setdefault(stage, {'calls': 0, 'time_s': 0.0, 'bytes': 0})
+        entry['calls'] += 1
+        entry['time_s'] += elapsed
+        entry['bytes'] += allocated
+
+    def as_dict(self):
+        """Returns {stage: {'calls', 'time_s', 'bytes'}} for every stage recorded."""
+        return {stage: dict(entry) for stage, entry in self.stages.items()}
+
+    def to_json(self, path=None):
+        """Returns the stats as a JSON string, also writing it to path if given."""
+        text = json.dumps(self.as_dict(), indent=1)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+#Shared stats object filled by the instrumented functions
+STATS = Stats()
+
+
+def enable(track_memory=False):
+    """Start recording. With track_memory, allocations are traced with tracemalloc, which slows NumPy code down."""
+    STATS.enabled = True
+    STATS.track_memory = track_memory
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    """Stop recording, keeping what was recorded in STATS."""
+    STATS.enabled = False
+    if STATS.track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    STATS.track_memory = False
+
+@contextmanager
+def stage(name):
+    """Context manager recording the enclosed block as one call of stage name.
+
+    Nested blocks of a stage that is already running are not recorded again.
+    """
+    if not STATS.enabled or any(frame[0] == name for frame in STATS._active):
+        yield
+        return
+
+    memory = STATS.track_memory and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in STATS._active:
+            frame[2] = max(frame[2], peak)
+        tracemalloc.reset_peak()
+    else:
+        current = 0
+    frame = [name, current, current]
+    STATS._active.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STATS._active.pop()
+        allocated = 0
+        if memory and tracemalloc.is_tracing():
+            frame[2] = max(frame[2], tracemalloc.get_traced_memory()[1])
+            allocated = frame[2] - frame[1]
+            for parent in STATS._active:
+                parent[2] = max(parent[2], frame[2])
+        STATS.record(name, elapsed, allocated)
+
+def timed(name):
+    """Decorator recording every call of the function as one call of stage name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not STATS.enabled:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,148 @@
+import os
+import sys
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+from hztrak.core import PSCOMPPARS_COLUMNS, PSCOMPPARS_ERROR_COLUMNS
+
+DEFAULT_MIRROR_PATH = os.path.join(os.path.expanduser('~'), '.hztrak', 'pscomppars.npy')
+STRING_COLUMNS = ('pl_name', 'hostname')
+
+
+def write_mirror(df, path=DEFAULT_MIRROR_PATH):
+    """Write a pscomppars DataFrame to a local mirror file.
+
+    The mirror is a NumPy structured array (fixed-width strings for names, float64 elsewhere) so it can be
+    memory-mapped when read back. PSCOMPPARS_ERROR_COLUMNS are kept when df has them.
+
+    Args:
+        df (pd.DataFrame): Table with at least the PSCOMPPARS_COLUMNS columns
+        path (str): Output .npy file
+    Returns:
+        str: The path written to
+    """
+    columns = PSCOMPPARS_COLUMNS + [col for col in PSCOMPPARS_ERROR_COLUMNS if col in df.columns]
+    dtype = []
+    for col in columns:
+        if col in STRING_COLUMNS:
+            width = max(1, int(df[col].astype(str).str.len().max())) if len(df) > 0 else 1
+            dtype.append((col, f'U{width}'))
+        else:
+            dtype.append((col, 'f8'))
+
+    data = np.empty(len(df), dtype=dtype)
+    for col in columns:
+        if col in STRING_COLUMNS:
+            data[col] = df[col].astype(str).to_numpy()
+        else:
+            data[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, data)
+    return path
+
+
+def snapshot_pscomppars(path=DEFAULT_MIRROR_PATH, archive=None):
+    """Snapshot the columns of pscomppars used by hztrak, with the stellar uncertainties, into a local mirror file.
+
+    Args:
+        path (str): Output .npy file
+        archive: object providing query_criteria, defaults to NasaExoplanetArchive
+    Returns:
+        str: The path written to
+    """
+    if archive is None:
+        from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
+        archive = NasaExoplanetArchive
+    columns = PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS
+    tab = archive.query_criteria(table="pscomppars", select=','.join(columns))
+    return write_mirror(tab[columns].to_pandas(), path)
+
+
+class PlanetMirror:
+    """Lazily loaded local copy of pscomppars with hash indexes on pl_name and hostname.
+
+    Nothing is read from disk until the first lookup. The file is memory-mapped, so only the rows
+    that are looked up are pulled into memory.
+
+    Args:
+        path (str): Mirror file written by write_mirror or snapshot_pscomppars
+    """
+
+    def __init__(self, path=DEFAULT_MIRROR_PATH):
+        self.path = path
+        self._data = None
+        self._name_index = None
+        self._host_index = None
+
+    @property
+    def data(self):
+        """np.ndarray: The memory-mapped structured array, loaded on first access."""
+        if self._data is None:
+            self._data = np.load(self.path, mmap_mode='r')
+        return self._data
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def columns(self):
+        """tuple: Columns stored in the mirror."""
+        return self.data.dtype.names
+
+    def __contains__(self, name):
+        return name in self.name_index
+
+    @property
+    def name_index(self):
+        """dict: Maps pl_name to its row in the mirror."""
+        if self._name_index is None:
+            self._name_index = {name: i for i, name in enumerate(self.data['pl_name'].tolist())}
+        return self._name_index
+
+    @property
+    def host_index(self):
+        """dict: Maps hostname to the list of rows of its planets."""
+        if self._host_index is None:
+            index = {}
+            for i, host in enumerate(self.data['hostname'].tolist()):
+                index.setdefault(host, []).append(i)
+            self._host_index = index
+        return self._host_index
+
+    def rows(self, indices):
+        """Returns the mirror rows at indices as a DataFrame with the mirror columns."""
+        return pd.DataFrame(self.data[np.asarray(indices, dtype=np.intp)], columns=list(self.columns))
+
+    def lookup(self, planet_name):
+        """Look up planets by name.
+
+        Args:
+            planet_name (list): list of planet names
+        Returns:
+            pd.DataFrame: Rows for the names found, in the order requested
+        """
+        index = self.name_index
+        return self.rows([index[name] for name in planet_name if name in index])
+
+    def lookup_host(self, hostname):
+        """Look up every planet orbiting the given hosts.
+
+        Args:
+            hostname (list): list of host star names
+        Returns:
+            pd.DataFrame: Rows for all planets of the hosts found
+        """
+        index = self.host_index
+        return self.rows([i for host in hostname for i in index.get(host, [])])
+
+
+@lru_cache(maxsize=None)
+def load_mirror(path=DEFAULT_MIRROR_PATH):
+    """Returns the shared PlanetMirror for path, so its indexes are built once per process."""
+    return PlanetMirror(path)
+
+
+if __name__ == "__main__":
+    print(snapshot_pscomppars(*sys.argv[1:2]))
@@ -0,0 +1,299 @@
+import os
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from hztrak.core import fill_orbits, PSCOMPPARS_COLUMNS
+from hztrak.evol_calc import hz_track, time_in_hz, HZ_TRACK_DTYPE
+
+MANIFEST = 'manifest.json'
+#Version of the evolution and habitable zone model, bump it when a change alters the stored results
+MODEL_VERSION = 1
+
+
+#Arrays stored for every planet in the chunk files
+RESULT_KEYS = ('pl_name', 'hostname', 'pl_orbsmax', 'tracks', 'hz_time', 'input_hash')
+
+
+def __chunk_path(out_dir, index):
+    return os.path.join(out_dir, f'chunk_{index:06d}.npz')
+
+def __is_chunk(filename):
+    return filename.startswith('chunk_') and filename.endswith('.npz') and '.tmp' not in filename
+
+def system_track(row, t_f=None, steps=100):
+    """Habitable zone track of the host of one planet row of get_current_parameters.
+
+    Args:
+        row (dict): planet row with st_lum [log10(Solar)], st_rad, st_teff, st_mass and st_age
+        t_f (float): end time, defaults to the star's st_age
+        steps (int): number of intervals in t_f
+    Returns:
+        np.ndarray: hz_track structured array, all NaN if the star is missing a parameter
+    """
+    star = {'st_lum': 10 ** row['st_lum'], 'st_rad': row['st_rad'], 'st_teff': row['st_teff'],
+            'st_mass': row['st_mass'], 'st_age': row['st_age'] if t_f is None else t_f}
+    if not all(np.isfinite(float(value)) for value in star.values()):
+        return np.full(steps, np.nan, dtype=HZ_TRACK_DTYPE)
+    return hz_track(star, steps=steps)
+
+def iter_system_tracks(df, t_f=None, steps=100):
+    """Generate the habitable zone track of every host star of a catalog, one star at a time.
+
+    Planets are grouped by host_key, so siblings listing different stellar parameters get their own track, named
+    as in system_names.
+
+    Args:
+        df (pd.DataFrame): get_current_parameters table
+        t_f (float): end time, defaults to each star's st_age
+        steps (int): number of intervals in t_f
+    Yields:
+        tuple: (name, track) for each host, in catalog order, e.g. for hztrak.store.write_tracks
+    """
+    rows = df.to_dict('records')
+    first, _ = host_index([host_key(row) for row in rows])
+    names = system_names([row['hostname'] for row in rows], [row['pl_name'] for row in rows], first)
+    for name, i in zip(names, first):
+        yield name, system_track(rows[i], t_f, steps)
+
+def input_hash(row, t_f=None, steps=100):
+    """Content hash of the inputs of one planet's results.
+
+    Covers the PSCOMPPARS_COLUMNS of the row, MODEL_VERSION, t_f and steps, so it changes whenever the stored
+    results of the planet would.
+
+    Args:
+        row (dict): planet row of get_current_parameters with pl_orbsmax filled in
+        t_f (float): end time, None for each star's st_age
+        steps (int): number of intervals in t_f
+    Returns:
+        str: hex digest
+    """
+    parts = [f'v{MODEL_VERSION}', repr(steps), repr(t_f if t_f is None else float(t_f))]
+    parts += [__value_key(row[col]) for col in PSCOMPPARS_COLUMNS]
+    return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).hexdigest()
+
+def __value_key(value):
+    """Helper method turning a catalog value into an exact string, with all missing values alike."""
+    if isinstance(value, str):
+        return value
+    value = float(value) if value is not None else np.nan
+    return 'nan' if np.isnan(value) else value.hex()
+
+#Columns that define the evolution of a host, planets of a host sharing all of them share one track
+HOST_COLUMNS = ('hostname', 'st_teff', 'st_rad', 'st_mass', 'st_lum', 'st_age')
+
+def host_key(row):
+    """Returns the key grouping planets whose host evolution is identical: the hostname and its HOST_COLUMNS values.
+
+    Planets of the same host can list different stellar parameters in pscomppars, these get different keys.
+    """
+    return '\x1f'.join(__value_key(row[col]) for col in HOST_COLUMNS)
+
+def host_index(keys):
+    """Group planets by host star.
+
+    Args:
+        keys (array-like): host_key (or hostname) of every planet
+    Returns:
+        tuple: (first, index), the position of the first planet of each unique host in order of appearance,
+        and for every planet the number of its host in first, so per-host results broadcast as results[index]
+    """
+    hosts, first, inverse = np.unique(np.asarray(keys, dtype=str), return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()]
+
+def system_names(hostnames, pl_names, first):
+    """Name the host groups of host_index.
+
+    A group is named after its hostname; when an earlier group of the same host has different stellar parameters,
+    the name is qualified by the group's first planet, e.g. 'Kepler-1 (Kepler-1 c)', so every name is unique.
+
+    Args:
+        hostnames (array-like): hostname of every planet
+        pl_names (array-like): pl_name of every planet
+        first (array-like): position of the first planet of each group, from host_index
+    Returns:
+        list: name of each group, in the order of first
+    """
+    names, seen = [], set()
+    for i in first:
+        host = str(hostnames[i])
+        names.append(f'{host} ({pl_names[i]})' if host in seen else host)
+        seen.add(host)
+    return names
+
+def duplicate_work(df, chunk_size=None):
+    """Count the host evolutions saved by evolving each host (host_key) once instead of once per planet.
+
+    Args:
+        df (pd.DataFrame): get_current_parameters table
+        chunk_size (int): planets per chunk of run_catalog, hosts are shared within a chunk, None for one chunk
+    Returns:
+        dict: planets, hosts (evolutions run) and avoided (evolutions saved)
+    """
+    keys = np.array([host_key(row) for row in df.to_dict('records')], dtype=str)
+    chunk_size = chunk_size or max(len(keys), 1)
+    hosts = sum(len(host_index(keys[start:start + chunk_size])[0]) for start in range(0, len(keys), chunk_size))
+    return {'planets': len(keys), 'hosts': hosts, 'avoided': len(keys) - hosts}
+
+def process_chunk(rows, t_f=None, steps=100):
+    """Evolve the hosts of a chunk of planets and compute their habitable zone tracks and times in the HZ.
+
+    Each host is evolved once per distinct set of stellar parameters (host_key) and its track is broadcast to the
+    planets sharing them, so the results do not depend on how the catalog is chunked.
+
+    Args:
+        rows (list): planet rows (dicts) of get_current_parameters with pl_orbsmax filled in
+        t_f (float): end time, defaults to each star's st_age
+        steps (int): number of intervals in t_f
+    Returns:
+        dict: arrays pl_name, hostname, pl_orbsmax, tracks (n, steps), hz_time (n,) and input_hash (n,), ready for np.savez
+    """
+    first, index = host_index([host_key(row) for row in rows])
+    host_tracks = np.empty((len(first), steps), dtype=HZ_TRACK_DTYPE)
+    for h, i in enumerate(first):
+        host_tracks[h] = system_track(rows[i], t_f, steps)
+    tracks = host_tracks[index]
+    orbits = np.array([row['pl_orbsmax'] for row in rows], dtype=float)
+
+    return {
+        'pl_name': np.array([row['pl_name'] for row in rows], dtype=str),
+        'hostname': np.array([row['hostname'] for row in rows], dtype=str),
+        'pl_orbsmax': orbits,
+        'tracks': tracks,
+        'hz_time': time_in_hz(tracks, orbits),
+        'input_hash': np.array([input_hash(row, t_f, steps) for row in rows], dtype=str),
+    }
+
+def __write_chunk(out_dir, index, result):
+    """Helper method writing a chunk atomically, so a crash never leaves a partial chunk behind."""
+    path = __chunk_path(out_dir, index)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **result)
+    os.replace(tmp, path)
+
+def __check_manifest(out_dir, names, chunk_size, t_f, steps, overwrite=False):
+    """Helper method writing the run manifest, or checking that a resumed run matches it."""
+    manifest = {'names': list(names), 'chunk_size': chunk_size, 't_f': t_f, 'steps': steps}
+    path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(path) and not overwrite:
+        with open(path) as f:
+            if json.load(f) != manifest:
+                raise ValueError(f"{out_dir} holds results of a different run, use another output directory")
+    else:
+        with open(path, 'w') as f:
+            json.dump(manifest, f)
+
+def __map_chunks(chunks, t_f, steps, workers):
+    """Helper method running process_chunk on every chunk, yielding (index, result) as chunks finish."""
+    if workers == 1:
+        for i, rows in chunks.items():
+            yield i, process_chunk(rows, t_f, steps)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_chunk, rows, t_f, steps): i for i, rows in chunks.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def run_catalog(df, out_dir, t_f=None, steps=100, chunk_size=500, workers=None, resume=True):
+    """Run the evolution and habitable zone computation for a whole catalog.
+
+    The catalog is split into chunks of chunk_size planets which are processed on a ProcessPoolExecutor.
+    Each chunk is written to out_dir as soon as it finishes, and chunks already on disk are skipped
+    when resume is True, so a crashed run continues where it stopped.
+
+    Args:
+        df (pd.DataFrame): get_current_parameters table
+        out_dir (str): directory for the chunk files
+        t_f (float): end time, defaults to each star's st_age
+        steps (int): number of intervals in t_f
+        chunk_size (int): planets per chunk
+        workers (int): worker processes, None uses all cores and 1 runs in this process
+        resume (bool): skip chunks already written by a previous run with the same inputs
+    Returns:
+        list: indices of the chunks computed by this call
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rows = fill_orbits(df).to_dict('records')
+    __check_manifest(out_dir, [row['pl_name'] for row in rows], chunk_size, t_f, steps)
+
+    chunks = {i: rows[start:start + chunk_size] for i, start in enumerate(range(0, len(rows), chunk_size))}
+    todo = [i for i in chunks if not (resume and os.path.exists(__chunk_path(out_dir, i)))]
+
+    for i, result in __map_chunks({i: chunks[i] for i in todo}, t_f, steps, workers):
+        __write_chunk(out_dir, i, result)
+    return todo
+
+def update_catalog(df, out_dir, t_f=None, steps=100, chunk_size=500, workers=None):
+    """Bring the results of a previous run up to date with a new version of the catalog.
+
+    Every stored planet carries the input_hash of its inputs. Only planets that are new or whose hash changed are
+    recomputed, results of planets no longer in the catalog are pruned, and the chunk files are rewritten in the
+    new catalog order. When nothing changed, nothing is computed or written.
+
+    Args:
+        df (pd.DataFrame): get_current_parameters table
+        out_dir (str): directory of the chunk files, may be empty or hold a run_catalog or update_catalog run
+        t_f (float): end time, defaults to each star's st_age
+        steps (int): number of intervals in t_f
+        chunk_size (int): planets per chunk
+        workers (int): worker processes, None uses all cores and 1 runs in this process
+    Returns:
+        dict: counts of planets computed, reused and removed
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rows = fill_orbits(df).to_dict('records')
+    keys = [(row['pl_name'], input_hash(row, t_f, steps)) for row in rows]
+
+    old = load_results(out_dir)
+    old_names = old['pl_name'].tolist() if old else []
+    previous = {}
+    if 'input_hash' in old:
+        for i, key in enumerate(zip(old_names, old['input_hash'].tolist())):
+            previous.setdefault(key, i)
+    todo = [i for i, key in enumerate(keys) if key not in previous]
+    names = [name for name, _ in keys]
+    stats = {'computed': len(todo), 'reused': len(rows) - len(todo), 'removed': len(set(old_names) - set(names))}
+    if len(todo) == 0 and old_names == names:
+        return stats
+
+    chunks = {i: [rows[j] for j in todo[start:start + chunk_size]] for i, start in enumerate(range(0, len(todo), chunk_size))}
+    parts = [result for _, result in sorted(__map_chunks(chunks, t_f, steps, workers), key=lambda item: item[0])]
+    if stats['reused'] > 0:
+        parts.insert(0, old)
+    #Position of each planet in the reused results followed by the computed ones
+    offset = len(old_names) if stats['reused'] > 0 else 0
+    fresh = dict(zip(todo, range(offset, offset + len(todo))))
+    take = np.array([fresh[i] if i in fresh else previous[key] for i, key in enumerate(keys)], dtype=np.intp)
+    merged = {key: np.concatenate([part[key] for part in parts])[take] for key in RESULT_KEYS} if parts else {}
+
+    n_chunks = 0
+    for n_chunks, start in enumerate(range(0, len(rows), chunk_size), start=1):
+        __write_chunk(out_dir, n_chunks - 1, {key: values[start:start + chunk_size] for key, values in merged.items()})
+    for p in os.listdir(out_dir):
+        if __is_chunk(p) and int(p[len('chunk_'):-len('.npz')]) >= n_chunks:
+            os.remove(os.path.join(out_dir, p))
+    __check_manifest(out_dir, names, chunk_size, t_f, steps, overwrite=True)
+    return stats
+
+def load_results(out_dir):
+    """Load and concatenate the chunk files written by run_catalog, in catalog order.
+
+    Args:
+        out_dir (str): directory given to run_catalog
+    Returns:
+        dict: arrays pl_name, hostname, pl_orbsmax, tracks, hz_time and input_hash for all completed chunks
+    """
+    if not os.path.isdir(out_dir):
+        return {}
+    paths = sorted(p for p in os.listdir(out_dir) if __is_chunk(p))
+    parts = [np.load(os.path.join(out_dir, p)) for p in paths]
+    if len(parts) == 0:
+        return {}
+    keys = [key for key in RESULT_KEYS if all(key in part for part in parts)]
+    return {key: np.concatenate([part[key] for part in parts]) for key in keys}
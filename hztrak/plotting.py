@@ -1,9 +1,11 @@
-import matplotlib.pyplot as plt
-import matplotlib.axes
-import pandas as pd
+import os
+import re
 import numpy as np
-from astropy.table import Table, QTable
-import astropy.units as u
+from concurrent.futures import ProcessPoolExecutor
+
+from hztrak.instrument import timed
+from hztrak.pipeline import host_index, system_names
+#matplotlib is imported inside the plotting functions so importing this module opens no windows and stays fast
 
 
 # d_TEST = {'time': pd.Series([0, 1, 2, 3]),
@@ -28,32 +30,118 @@ import astropy.units as u
 
 
 
-def visualize_1(astropy_table, planet_AU):
+def __values(column):
+    """Helper method returning the float values of a table column, Quantity or array-like."""
+    return np.asarray(getattr(column, 'value', column), dtype=float)
+
+def __unit(column, default):
+    """Helper method returning the unit of a table column, or default for plain arrays."""
+    unit = getattr(column, 'unit', None)
+    return default if unit is None else unit
+
+def __axes(ax, figsize, **kwargs):
+    """Helper method returning (fig, ax), making a new pyplot figure when no axes are given."""
+    if ax is not None:
+        return ax.figure, ax
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=figsize)
+    return fig, fig.add_subplot(**kwargs)
+
+#Colour and opacity of the habitable zone scenarios of evol_calc.HZ_ZONES
+ZONE_STYLES = {
+    'optimistic': ('lightgreen', 0.3),
+    'conservative': ('green', 0.4),
+    'conservative_0.1': ('olivedrab', 0.3),
+    'conservative_5': ('darkgreen', 0.3),
+}
+
+def draw_planets(ax, planet_AU, **kwargs):
+    """Draw a dashed horizontal line across the axes at every planet distance.
+
+    All lines are one LineCollection, so the cost does not grow with one artist per planet.
+
+    Args:
+        ax (matplotlib.axes.Axes): axes to draw on
+        planet_AU (array-like): planet distances from the star in AU, NaNs are skipped
+        **kwargs: passed to LineCollection
+    Returns:
+        matplotlib.collections.LineCollection
+    """
+    from matplotlib.collections import LineCollection
+
+    y = __values(planet_AU).ravel()
+    y = y[np.isfinite(y)]
+    segments = np.zeros((len(y), 2, 2))
+    segments[:, 1, 0] = 1   # x in axes coordinates, spanning the whole axes like axhline
+    segments[:, :, 1] = y[:, np.newaxis]
+    style = {'colors': 'k', 'linestyles': '--'}
+    style.update(kwargs)
+    lines = LineCollection(segments, transform=ax.get_yaxis_transform(), **style)
+    ax.add_collection(lines, autolim=False)
+    if len(y):
+        ax.update_datalim(np.column_stack([np.zeros_like(y), y]), updatex=False)
+        ax.autoscale_view()
+    return lines
+
+@timed('plot')
+def visualize_1(astropy_table, planet_AU, ax=None):
     """Visualization_1
 
     Plot the evolution of the habitable zone over time.
 
     Args:
-        astropy_table (astropy_table): Columns are time, distance_hz_in, distance_hz_out
+        astropy_table (astropy_table): Columns are time, distance_hz_in, distance_hz_out, any mapping of columns works
 
         planet_AU (list): List of planet distances from star in AU
+
+        ax (matplotlib.axes.Axes): axes to draw on, a new figure is made if None
     
     Returns:
         fig, ax
     """
+    fig, ax = __axes(ax, (12, 7))
+    ax.fill_between(__values(astropy_table["time"]), __values(astropy_table["distance_hz_in"]),
+                    y2=__values(astropy_table["distance_hz_out"]), color='green', alpha=0.4)
+    draw_planets(ax, planet_AU)
+
+    ax.set_title("Habitable Zone over Time")
+    ax.set_xlabel(f"Time ({__unit(astropy_table['time'], 'Gyr')})")
+    ax.set_ylabel(f"Distance from Star ({__unit(astropy_table['distance_hz_in'], 'AU')})")
 
-    df = astropy_table.to_pandas()
+    return fig, ax
 
-    fig, ax = plt.subplots(figsize = (12,7))
-    ax.fill_between(df["time"], df["distance_hz_in"], y2= df["distance_hz_out"], color = 'green', alpha = 0.4)
-    
-    for i in planet_AU:
-        ax.axhline(y=i, color='k', linestyle='--')
+@timed('plot')
+def visualize_track(track, planet_AU=(), zones=('optimistic', 'conservative'), ax=None, time_unit='Gyr'):
+    """Plot the habitable zone scenarios of an hz_track over time.
 
-    ax.set_title("Habitable Zone over Time")
-    ax.set_xlabel(f"Time ({astropy_table['time'].unit})")
-    ax.set_ylabel(f"Distance from Star ({astropy_table['distance_hz_in'].unit})")
+    Each scenario is a single fill_between call and the planets a single LineCollection, reading the columns of
+    the structured track directly.
 
+    Args:
+        track (np.ndarray): habitable zone track from evol_calc.hz_track or pipeline.load_results
+        planet_AU (array-like): planet distances from the star in AU
+        zones (tuple): scenarios of evol_calc.HZ_ZONES to fill, drawn in order
+        ax (matplotlib.axes.Axes): axes to draw on, a new figure is made if None
+        time_unit (str): unit of the time axis of the track, Gyr for tracks evolved to the archive's st_age
+    Returns:
+        fig, ax
+    """
+    from hztrak.evol_calc import HZ_ZONES
+
+    fig, ax = __axes(ax, (12, 7))
+    time = track['time_yr']
+    for zone in zones:
+        inner, outer = HZ_ZONES[zone]
+        color, alpha = ZONE_STYLES.get(zone, ('green', 0.3))
+        ax.fill_between(time, track[f'{inner}_AU'], track[f'{outer}_AU'], color=color, alpha=alpha,
+                        linewidth=0, label=zone)
+    draw_planets(ax, planet_AU)
+
+    ax.set_title("Habitable Zone over Time")
+    ax.set_xlabel(f"Time ({time_unit})")
+    ax.set_ylabel("Distance from Star (AU)")
+    if len(zones) > 1:
+        ax.legend(loc='upper left')
     return fig, ax
 
 
@@ -74,41 +162,132 @@ d_TEST = {'pl_orbsmax': pd.Series([0, 1, 2, 3]),
 
 df_TEST = pd.DataFrame(d_TEST)'''
 
-a = np.array([0, 1, 2, 3], dtype=np.int32) * u.AU
-
-b = [0.8, 0.8, 0.9, 1.2] * u.AU
+@timed('plot')
+def visualize_polar(astropy_table, distance_bc, habitable_zone, ax=None):
+    """Polar plot of the planets of a system around the habitable zone.
 
-c = [1, 1, 1.1, 1.5] * u.AU
-
-at_TEST = QTable([a, b, c],
-            names=('pl_orbsmax', 'distance_hz_in', 'distance_hz_out'),
-            meta={'name': 'hz table'})
-
-
-
-def visualize_polar(astropy_table, distance_bc, habitable_zone):
-
-    df = astropy_table.to_pandas()
-    theta = np.linspace(0, 2*np.pi, len(df), endpoint=False)
-    distance_bc = df['pl_orbsmax'] #orbit semi-major axis [AU]
+    Args:
+        astropy_table (astropy_table): table with a pl_orbsmax column [AU], any mapping of columns works
+        distance_bc (list): unused, the distances are read from pl_orbsmax
+        habitable_zone (tuple): inner and outer edges of the habitable zone in AU
+        ax (matplotlib.axes.Axes): polar axes to draw on, a new figure is made if None
+    Returns:
+        fig, ax
+    """
+    distance_bc = __values(astropy_table['pl_orbsmax']) #orbit semi-major axis [AU]
+    theta = np.linspace(0, 2*np.pi, len(distance_bc), endpoint=False)
     colors = distance_bc
     area = 200
 
-    fig = plt.figure(figsize=(6, 6))
-    ax = fig.add_subplot(projection='polar')
+    fig, ax = __axes(ax, (6, 6), projection='polar')
 
-    theta_fill = np.linspace(0, 2*np.pi, 500)
+    theta_fill = np.linspace(0, 2*np.pi, 200)
     distance_hz_in, distance_hz_out = habitable_zone
-    ax.fill(theta_fill, [distance_hz_out]*len(theta_fill), color='lightgreen', alpha=0.3, zorder=0)
-    ax.fill(theta_fill, [distance_hz_in]*len(theta_fill), color='white', alpha=1.0, zorder=1)
+    ax.fill_between(theta_fill, distance_hz_in, distance_hz_out, color='lightgreen', alpha=0.3, linewidth=0, zorder=0)
 
     ax.scatter(0, 0, marker='*', color='gold', s=500, label='The star', zorder=5)
 
     scatter = ax.scatter(theta, distance_bc, c=colors, s=area, cmap='plasma', alpha=0.75, zorder=3)
 
-    plt.colorbar(scatter, ax=ax, label='Distance from the star (AU)')
+    fig.colorbar(scatter, ax=ax, label='Distance from the star (AU)')
     ax.set_title('Polar plot of the planets in the habitable zone')
 
+    return fig, ax
+
+
+def __figure_name(name):
+    """Helper method turning a system name into a file name."""
+    return re.sub(r'[^\w.+-]+', '_', str(name)).strip('_') or 'system'
+
+def save_system_figure(path, track, planet_AU=(), title=None, zones=('optimistic', 'conservative')):
+    """Render the habitable zone track of one system straight to a file, without pyplot or a display.
+
+    Args:
+        path (str): output file, the format follows its extension (png, svg, pdf...)
+        track (np.ndarray): habitable zone track
+        planet_AU (array-like): planet distances from the star in AU
+        title (str): figure title, e.g. the hostname
+        zones (tuple): scenarios of evol_calc.HZ_ZONES to fill
+    Returns:
+        str: path
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.add_subplot()
+    visualize_track(track, planet_AU, zones, ax=ax)
+    if title is not None:
+        ax.set_title(title)
+    fig.savefig(path)
+    return path
+
+def __export_batch(systems, out_dir, fmt, zones):
+    """Helper method rendering a list of (name, track, planet_AU) systems, run on the worker processes."""
+    return [save_system_figure(os.path.join(out_dir, f'{__figure_name(name)}.{fmt}'), track, planet_AU, str(name), zones)
+            for name, track, planet_AU in systems]
+
+def iter_result_systems(results):
+    """Group the planets of pipeline.load_results by host.
+
+    Planets sharing a hostname and a track form one system; siblings whose stellar parameters (hence tracks) differ
+    get their own system, named as in pipeline.system_names.
+
+    Args:
+        results (dict): arrays pl_name, hostname, pl_orbsmax and tracks of a catalog run
+    Yields:
+        tuple: (name, track, planet_AU) for each host, in catalog order
+    """
+    tracks = results['tracks']
+    keys = [f'{host}\x1f{track.tobytes().hex()}' for host, track in zip(results['hostname'], tracks)]
+    first, index = host_index(keys)
+    names = system_names(results['hostname'], results['pl_name'], first)
+    for h, (name, i) in enumerate(zip(names, first)):
+        yield name, tracks[i], results['pl_orbsmax'][index == h]
+
+def export_systems(systems, out_dir, fmt='png', workers=None, batch_size=20, zones=('optimistic', 'conservative')):
+    """Headless export of one habitable zone figure per system.
+
+    Figures are drawn on plain matplotlib Figures (Agg/SVG canvases, no pyplot state or display) in batches of
+    batch_size systems spread over a ProcessPoolExecutor.
+
+    Args:
+        systems (iterable): (name, track, planet_AU) tuples, e.g. from iter_result_systems
+        out_dir (str): directory for the figures, one <name>.<fmt> per system
+        fmt (str): file format, e.g. png or svg
+        workers (int): worker processes, None uses all cores and 1 runs in this process
+        batch_size (int): systems rendered per task
+        zones (tuple): scenarios of evol_calc.HZ_ZONES to fill
+    Returns:
+        list: paths of the figures written, in the order of systems
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    systems = list(systems)
+    batches = [systems[start:start + batch_size] for start in range(0, len(systems), batch_size)]
+
+    if workers == 1:
+        return [path for batch in batches for path in __export_batch(batch, out_dir, fmt, zones)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(__export_batch, batch, out_dir, fmt, zones) for batch in batches]
+        return [path for future in futures for path in future.result()]
+
+
+if __name__ == "__main__":
+    from astropy.table import QTable
+    import astropy.units as u
+
+    a = np.array([0, 1, 2, 3], dtype=np.int32) * u.AU
+
+    b = [0.8, 0.8, 0.9, 1.2] * u.AU
+
+    c = [1, 1, 1.1, 1.5] * u.AU
+
+    at_TEST = QTable([a, b, c],
+                names=('pl_orbsmax', 'distance_hz_in', 'distance_hz_out'),
+                meta={'name': 'hz table'})
+
+    import matplotlib.pyplot as plt
+
+    habitable_zone = (1.0,2.0) #I still have to figure out how to connect with nick's part
+    visualize_polar(at_TEST, [0, 7], habitable_zone)
     plt.show()
-habitable_zone = (1.0,2.0) #I still have to figure out how to connect with nick's part
-visualize_polar(at_TEST, [0, 7], habitable_zone)
@@ -0,0 +1,179 @@
+import os
+import json
+import numpy as np
+
+from hztrak.evol_calc import HZ_TRACK_DTYPE
+
+SCHEMA = 'schema.json'
+INDEX = 'index.tsv'
+DEFAULT_ROW_GROUP_SIZE = 65536
+
+
+def column_file(path, field):
+    """Returns the file of a store directory holding the raw float64 values of field."""
+    return os.path.join(path, f'{field}.f8')
+
+
+class TrackWriter:
+    """Append per-star tracks to an on-disk columnar store.
+
+    The store is a directory holding one raw float64 file per field of HZ_TRACK_DTYPE (time, L, R, T and the six
+    HZ distances) plus an index.tsv of star id, offset and length. Rows are buffered and appended to the column
+    files in row groups of row_group_size rows, and the index lines of a row group are appended after its data,
+    so memory stays flat however many stars are written and a crash loses at most the last row group.
+
+    Args:
+        path (str): store directory, created if needed
+        row_group_size (int): rows buffered before they are appended to the column files
+        append (bool): add to an existing store instead of starting a new one
+    """
+
+    def __init__(self, path, row_group_size=DEFAULT_ROW_GROUP_SIZE, append=False):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.fields = HZ_TRACK_DTYPE.names
+        os.makedirs(path, exist_ok=True)
+
+        if not (append and os.path.exists(os.path.join(path, INDEX))):
+            for field in self.fields:
+                open(column_file(path, field), 'wb').close()
+            open(os.path.join(path, INDEX), 'w').close()
+            with open(os.path.join(path, SCHEMA), 'w') as f:
+                json.dump({'fields': list(self.fields), 'dtype': '<f8'}, f)
+        self._rows = self.__recover()
+        self._buffer = []
+        self._ids = []
+        self._buffered = 0
+
+    def __recover(self):
+        """Cut the store back to the rows listed in the index and return their count.
+
+        A crash during flush can leave the column files with different lengths, or a partial last index line;
+        everything past the last complete index entry is dropped so appended rows stay aligned.
+        """
+        index_path = os.path.join(self.path, INDEX)
+        with open(index_path) as f:
+            lines = f.readlines()
+        rows = 0
+        complete = 0
+        for line in lines:
+            fields = line.rstrip('\n').split('\t')
+            if not line.endswith('\n') or len(fields) != 3:
+                break
+            rows = int(fields[1]) + int(fields[2])
+            complete += 1
+        if complete < len(lines):
+            with open(index_path, 'w') as f:
+                f.writelines(lines[:complete])
+        for field in self.fields:
+            if os.path.getsize(column_file(self.path, field)) != rows * 8:
+                os.truncate(column_file(self.path, field), rows * 8)
+        return rows
+
+    def append(self, star_id, track):
+        """Add the track of one star.
+
+        Args:
+            star_id (str): identifier of the star, e.g. its hostname
+            track (np.ndarray): structured array with the HZ_TRACK_DTYPE fields, e.g. from hz_track
+        """
+        self._ids.append(str(star_id))
+        self._buffer.append(track)
+        self._buffered += len(track)
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered row group to the column files, then its entries to the index."""
+        if not self._buffer:
+            return
+        rows = np.concatenate(self._buffer)
+        for field in self.fields:
+            with open(column_file(self.path, field), 'ab') as f:
+                np.ascontiguousarray(rows[field], dtype='<f8').tofile(f)
+
+        lines = []
+        for star_id, track in zip(self._ids, self._buffer):
+            lines.append(f'{star_id}\t{self._rows}\t{len(track)}\n')
+            self._rows += len(track)
+        with open(os.path.join(self.path, INDEX), 'a') as f:
+            f.writelines(lines)
+        self._buffer, self._ids, self._buffered = [], [], 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrackReader:
+    """Read tracks from a store written by TrackWriter.
+
+    Column files are memory-mapped, so reading one star only touches that star's rows.
+
+    Args:
+        path (str): store directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, SCHEMA)) as f:
+            self.fields = tuple(json.load(f)['fields'])
+        ids, offsets, lengths = [], [], []
+        with open(os.path.join(path, INDEX)) as f:
+            for line in f:
+                star_id, offset, length = line.rstrip('\n').split('\t')
+                ids.append(star_id)
+                offsets.append(int(offset))
+                lengths.append(int(length))
+        self.star_ids = ids
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self._rows = {star_id: i for i, star_id in enumerate(ids)}
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.star_ids)
+
+    def __contains__(self, star_id):
+        return star_id in self._rows
+
+    def column(self, field):
+        """Returns the whole memory-mapped column for field."""
+        if field not in self._columns:
+            n = int((self.offsets + self.lengths).max()) if len(self) else 0
+            if n == 0:
+                return np.empty(0)
+            self._columns[field] = np.memmap(column_file(self.path, field), dtype='<f8', mode='r', shape=(n,))
+        return self._columns[field]
+
+    def __getitem__(self, star_id):
+        """Returns the track of star_id as a structured array with the stored fields."""
+        i = self._rows[star_id]
+        sl = slice(int(self.offsets[i]), int(self.offsets[i] + self.lengths[i]))
+        track = np.empty(int(self.lengths[i]), dtype=[(field, 'f8') for field in self.fields])
+        for field in self.fields:
+            track[field] = self.column(field)[sl]
+        return track
+
+
+def write_tracks(path, tracks, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """Stream (star_id, track) pairs from any iterable, e.g. a generator, into a new track store.
+
+    Args:
+        path (str): store directory
+        tracks (iterable): (star_id, track) pairs
+        row_group_size (int): rows buffered before they are written
+    Returns:
+        int: number of tracks written
+    """
+    n = 0
+    with TrackWriter(path, row_group_size) as writer:
+        for star_id, track in tracks:
+            writer.append(star_id, track)
+            n += 1
+    return n
@@ -0,0 +1,104 @@
+import numpy as np
+
+from hztrak.core import find_hz_batch, fill_orbits, HZ_LABELS
+from hztrak.evol_calc import alpha_beta_gamma_batch, luminosity_evolve, radius_evolve, temp_evolve, time_in_hz, HZ_TRACK_DTYPE, HZ_ZONES
+
+#Stellar parameters drawn by sample_parameters, with their err1/err2 columns in PSCOMPPARS_ERROR_COLUMNS
+SAMPLED_COLUMNS = ('st_teff', 'st_lum', 'st_mass', 'st_age')
+#Number of (sample, step) elements evolved at once by hz_uncertainty, bounds the memory of each chunk
+CHUNK_ELEMENTS = 1000000
+
+
+def sample_parameters(df, n_samples, rng):
+    """Draw samples of st_teff, st_lum, st_mass and st_age for every star.
+
+    Each parameter follows a split normal with the archive's upper (err1) and lower (err2) uncertainties on either
+    side. Missing uncertainties give no spread; non-physical draws (mass, age or Teff <= 0) are set to NaN.
+
+    Args:
+        df (pd.DataFrame): get_current_parameters(..., uncertainties=True) table
+        n_samples (int): samples per star
+        rng (np.random.Generator): random generator
+    Returns:
+        dict: (N_stars, n_samples) arrays keyed by the SAMPLED_COLUMNS, st_lum in log10(Solar) like the archive
+    """
+    z = rng.standard_normal((len(df), n_samples, len(SAMPLED_COLUMNS)))
+    samples = {}
+    for k, col in enumerate(SAMPLED_COLUMNS):
+        value = df[col].to_numpy(dtype=float)[:, np.newaxis]
+        upper = np.abs(df[f'{col}err1'].to_numpy(dtype=float)) if f'{col}err1' in df else np.zeros(len(df))
+        lower = np.abs(df[f'{col}err2'].to_numpy(dtype=float)) if f'{col}err2' in df else np.zeros(len(df))
+        spread = np.where(z[..., k] >= 0, np.nan_to_num(upper)[:, np.newaxis], np.nan_to_num(lower)[:, np.newaxis])
+        samples[col] = value + z[..., k] * spread
+        if col != 'st_lum':
+            samples[col][samples[col] <= 0] = np.nan
+    return samples
+
+def __sampled_tracks(samples, steps):
+    """Helper method evolving every sample over [0, st_age] and returning HZ tracks of shape (N, n_samples, steps).
+
+    The evolution laws only depend on t / t_f, so all samples share one normalized grid that is scaled by their age.
+    """
+    teff, L_0, mass, age = samples['st_teff'], 10 ** samples['st_lum'], samples['st_mass'], samples['st_age']
+    alpha, beta, gamma = (p[..., np.newaxis] for p in alpha_beta_gamma_batch(mass))
+    u = np.linspace(0, 1, steps)
+
+    L = luminosity_evolve(L_0[..., np.newaxis], beta, 1.0, u, alpha)
+    R = radius_evolve(1.0, gamma, 1.0, u, alpha)
+    T = temp_evolve(teff[..., np.newaxis], L, L_0[..., np.newaxis], R, 1.0)
+    distances, _ = find_hz_batch(T, L)
+
+    track = np.empty(L.shape, dtype=HZ_TRACK_DTYPE)
+    track['time_yr'] = u * age[..., np.newaxis]
+    track['luminosity_Lsun'] = L
+    track['radius_Rsun'] = R   # relative to the initial radius, which cancels out of T
+    track['temperature_K'] = T
+    for i, label in enumerate(HZ_LABELS):
+        track[f'{label}_AU'] = distances[..., i]
+    return track
+
+def hz_uncertainty(df, n_samples=1000, steps=20, percentiles=(16, 50, 84), seed=None, chunk_size=None):
+    """Monte Carlo propagation of the stellar uncertainties to the habitable zone edges and the time in the HZ.
+
+    For every star, n_samples draws of st_teff, st_lum, st_mass and st_age are pushed through the vectorized
+    evolution and HZ computation. Stars are processed in chunks so memory stays bounded; the draws are taken from
+    the seeded generator in catalog order, so results do not depend on chunk_size.
+
+    Args:
+        df (pd.DataFrame): get_current_parameters(..., uncertainties=True) table
+        n_samples (int): samples per star
+        steps (int): number of intervals of each sampled evolution track
+        percentiles (tuple): percentiles of the sampled distributions to return
+        seed (int): seed of the random generator, for reproducible results
+        chunk_size (int): stars per chunk, defaults to keeping CHUNK_ELEMENTS sample steps per chunk
+
+    Returns:
+        dict: 'percentiles'; 'hz_edges', the percentiles of the present day HZ_LABELS distances (AU) with shape
+        (N_stars, len(percentiles), 6); and 'hz_time', a dict with the percentiles of the time spent in each zone of
+        HZ_ZONES with shape (N_stars, len(percentiles))
+    """
+    df = fill_orbits(df)
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or max(1, CHUNK_ELEMENTS // (n_samples * steps))
+    n = len(df)
+
+    hz_edges = np.empty((n, len(percentiles), len(HZ_LABELS)))
+    hz_time = {zone: np.empty((n, len(percentiles))) for zone in HZ_ZONES}
+    for start in range(0, n, chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        samples = sample_parameters(chunk, n_samples, rng)
+        sl = slice(start, start + len(chunk))
+
+        edges, _ = find_hz_batch(samples['st_teff'], 10 ** samples['st_lum'])
+        with np.errstate(invalid='ignore'):
+            hz_edges[sl] = np.moveaxis(np.nanpercentile(edges, percentiles, axis=1), 0, 1)
+
+        tracks = __sampled_tracks(samples, steps)
+        orbits = np.repeat(chunk['pl_orbsmax'].to_numpy(dtype=float), n_samples)
+        times = time_in_hz(tracks.reshape(-1, steps), orbits)
+        for zone in HZ_ZONES:
+            durations = times[f'{zone}_time'].reshape(len(chunk), n_samples)
+            with np.errstate(invalid='ignore'):
+                hz_time[zone][sl] = np.nanpercentile(durations, percentiles, axis=1).T
+
+    return {'percentiles': tuple(percentiles), 'hz_edges': hz_edges, 'hz_time': hz_time}
@@ -0,0 +1,126 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import re
+import json
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import pytest
+from hztrak.core import PSCOMPPARS_COLUMNS, get_current_parameters_async, iter_current_parameters
+from hztrak.archive import AsyncArchiveClient, ArchiveError
+
+NAMES = [f'Planet-{i} b' for i in range(10)] + ["O'Neill b"]
+
+
+class FakeTAP(ThreadingHTTPServer):
+    """Local TAP endpoint answering pscomppars queries, with scripted failures and delays."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeTAPHandler)
+        self.rows = {name: dict({col: float(i) for col in PSCOMPPARS_COLUMNS}, pl_name=name, hostname=name[:-2])
+                     for i, name in enumerate(NAMES)}
+        self.rows[NAMES[0]]['st_age'] = None
+        self.failures = []   # statuses returned by the next requests
+        self.delay = 0.0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/TAP/sync'
+
+
+class FakeTAPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            status = server.failures.pop(0) if server.failures else 200
+        time.sleep(server.delay)
+        query = parse_qs(urlsplit(self.path).query)['query'][0]
+        names = [name.replace("''", "'") for name in re.findall(r"'((?:[^']|'')*)'", query.split(' in ', 1)[1])]
+        body = json.dumps([server.rows[name] for name in names if name in server.rows] if status == 200 else 'error').encode()
+        with server.lock:
+            server.active -= 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def tap():
+    server = FakeTAP()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+async def collect(client, names, chunk_size):
+    return [df async for df in client.iter_planets(names, chunk_size=chunk_size)]
+
+def test_iter_planets_concurrent_and_capped(tap):
+    tap.delay = 0.05
+    client = AsyncArchiveClient(tap.url, concurrency=3)
+    parts = asyncio.run(collect(client, NAMES, 1))
+    client.close()
+    assert len(parts) == len(NAMES) and tap.requests == len(NAMES)
+    assert sorted(name for df in parts for name in df['pl_name']) == sorted(NAMES)
+    assert tap.max_active == 3
+    assert parts[0]['st_teff'].dtype == float
+
+def test_retries_with_backoff(tap):
+    tap.failures = [503, 500]
+    client = AsyncArchiveClient(tap.url, retries=2, backoff=0.01)
+    rows = asyncio.run(client.query("select pl_name from pscomppars where pl_name in ('Planet-1 b')"))
+    assert rows[0]['pl_name'] == 'Planet-1 b' and tap.requests == 3
+
+    tap.failures = [503] * 3
+    with pytest.raises(ArchiveError):
+        asyncio.run(client.query("select pl_name from pscomppars where pl_name in ('Planet-1 b')"))
+    tap.requests = 0
+    tap.failures = [400]
+    with pytest.raises(ArchiveError):
+        asyncio.run(client.query("select pl_name from pscomppars where pl_name in ('Planet-1 b')"))
+    assert tap.requests == 1
+
+def test_timeout_and_rate_limit(tap):
+    tap.delay = 0.5
+    client = AsyncArchiveClient(tap.url, retries=1, backoff=0.01, timeout=0.1)
+    with pytest.raises(ArchiveError):
+        asyncio.run(client.query("select pl_name from pscomppars where pl_name in ('Planet-1 b')"))
+
+    tap.delay = 0.0
+    client = AsyncArchiveClient(tap.url, rate=20)
+    start = time.perf_counter()
+    asyncio.run(collect(client, NAMES[:5], 1))
+    assert time.perf_counter() - start >= 0.2
+
+def test_get_current_parameters_async_uses_cache(tap, tmp_path):
+    cache_path = str(tmp_path / 'cache.pkl')
+    names = ['Planet-3 b', 'Nope b', "O'Neill b", 'Planet-0 b']
+    client = AsyncArchiveClient(tap.url)
+    df = asyncio.run(get_current_parameters_async(names, cache_path=cache_path, client=client, chunk_size=2))
+    assert list(df['pl_name']) == ['Planet-3 b', "O'Neill b", 'Planet-0 b']
+    assert list(df.columns) == PSCOMPPARS_COLUMNS
+
+    requests = tap.requests
+    async def first_batch():
+        async for batch in iter_current_parameters(names[:1], cache_path=cache_path, client=client):
+            return batch
+    assert list(asyncio.run(first_batch())['pl_name']) == ['Planet-3 b']
+    assert tap.requests == requests
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import numpy as np
+from hztrak.core import find_hz_batch
+from hztrak.evol_calc import evolve_population
+from hztrak.atlas import build_atlas, HZAtlas
+
+MASS = [0.3, 0.8, 1.0, 1.2]
+TEFF = np.linspace(3000, 7000, 9)
+LUM = np.logspace(-2, 1, 4)
+T_F = 1e10
+AGE = np.linspace(0, T_F, 6)
+
+@pytest.fixture(scope='module')
+def atlas(tmp_path_factory):
+    return build_atlas(str(tmp_path_factory.mktemp('atlas')), MASS, TEFF, LUM, AGE, t_f=T_F, workers=1)
+
+def reference(mass, teff, lum, steps=len(AGE)):
+    _, L, R, T = evolve_population(lum, 1.0, teff, mass, t_f=T_F, steps=steps)
+    return find_hz_batch(T, L)[0]
+
+def test_atlas_matches_direct_computation_on_nodes(atlas):
+    assert atlas.shape == (4, 9, 4, 6)
+    assert np.allclose(atlas.edges[2, 4, 1], reference(1.0, 5000.0, LUM[1])[0])
+    distances, valid = atlas(1.0, 5000.0, LUM[1], AGE)
+    assert valid.all()
+    assert np.allclose(distances, reference(1.0, 5000.0, LUM[1])[0])
+
+def test_atlas_interpolates_between_nodes(atlas):
+    lum = np.array([0.05, 0.5, 3.0])
+    distances, valid = atlas(1.0, 5000.0, lum, AGE[3])
+    assert np.allclose(distances, reference(1.0, 5000.0, lum)[:, 3], rtol=1e-12)   # exact along L_0
+
+    teff = np.array([3300.0, 5100.0, 6666.0])
+    ages = np.linspace(0, T_F, 51)
+    distances, valid = atlas(1.0, teff[:, np.newaxis], 1.0, ages)
+    assert np.allclose(distances, reference(1.0, teff, 1.0, steps=51), rtol=0.02)
+
+    distances, valid = atlas([1.0, 5.0], 5000.0, 1.0, 0.0)
+    assert list(valid.all(axis=-1)) == [True, False]
+    assert np.isnan(distances[1]).all()
+
+def test_atlas_pool_and_reload(atlas, tmp_path):
+    pooled = build_atlas(str(tmp_path / 'pool'), MASS, TEFF, LUM, AGE, t_f=T_F, workers=2)
+    assert np.array_equal(np.asarray(pooled.edges), np.asarray(atlas.edges), equal_nan=True)
+    reloaded = HZAtlas.load(atlas.path)
+    assert isinstance(reloaded.edges, np.memmap) and reloaded.t_f == T_F
+    with pytest.raises(ValueError):
+        build_atlas(str(tmp_path / 'bad'), [1.0], TEFF, LUM, AGE)
@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+import json
+import bench_hztrak
+
+def test_benchmarks_run_at_smallest_scale():
+    results = bench_hztrak.run(scales=('1',), repeat=1)
+    assert set(results) == {f'{name}[1]' for name in bench_hztrak.BENCHMARKS}
+    assert all(result['wall_s'] > 0 for result in results.values())
+
+def test_compare_flags_regressions():
+    baseline = {'find_hz[1k]': {'wall_s': 1.0, 'peak_mb': 10.0}}
+    assert bench_hztrak.compare({'find_hz[1k]': {'wall_s': 1.2, 'peak_mb': 10.0}}, baseline, 1.5) == []
+    regressions = bench_hztrak.compare({'find_hz[1k]': {'wall_s': 2.0, 'peak_mb': 10.0}}, baseline, 1.5)
+    assert len(regressions) == 1 and 'wall_s' in regressions[0]
+    #slowdowns within the noise floor are ignored however large the ratio
+    assert bench_hztrak.compare({'orbits[1]': {'wall_s': 0.003, 'peak_mb': 0.5}},
+                                {'orbits[1]': {'wall_s': 0.001, 'peak_mb': 0.1}}, 1.5) == []
+
+def test_default_baseline_covers_small_scales():
+    with open(bench_hztrak.DEFAULT_BASELINE) as f:
+        baseline = json.load(f)
+    assert set(baseline) == {f'{name}[{scale}]' for name in bench_hztrak.BENCHMARKS for scale in ('1', '1k')}
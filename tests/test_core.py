@@ -0,0 +1,234 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import numpy as np
+import astropy.units as u
+from hztrak.core import find_hz, find_hz_batch, HZ_LABELS
+
+def test_find_hz_sun():
+    table = find_hz(5780 * u.K, 1.0 * u.Lsun)
+    assert list(table['Label']) == list(HZ_LABELS)
+    assert table['Distance'].unit == u.AU
+    # recent venus is the innermost bound, early mars the outermost
+    assert table['Distance'][0] < table['Distance'][2] < table['Distance'][5]
+    assert np.isclose(table['Distance'][2].value, 1 / np.sqrt(1.107))
+
+def test_find_hz_batch_matches_scalar():
+    teff = np.array([3500, 5780, 6500])
+    lum = np.array([0.02, 1.0, 3.0])
+    distances, valid = find_hz_batch(teff, lum)
+    assert distances.shape == (3, 6)
+    assert valid.all()
+    for i in range(3):
+        expected = find_hz(teff[i], lum[i])['Distance'].value
+        assert np.allclose(distances[i], expected)
+
+def test_find_hz_batch_broadcasts_grid():
+    teff = np.linspace(3000, 7000, 4)[:, np.newaxis]
+    lum = np.array([0.5, 1.0, 2.0])
+    distances, valid = find_hz_batch(teff * u.K, lum * u.Lsun)
+    assert distances.shape == (4, 3, 6)
+    assert valid.shape == (4, 3, 6)
+
+def test_find_hz_batch_masks_invalid_star():
+    distances, valid = find_hz_batch([5780, 5780], [1.0, -1.0])
+    assert valid[0].all()
+    assert not valid[1].any()
+    assert np.isnan(distances[1]).all()
+    with pytest.raises(RuntimeError):
+        find_hz(5780, -1.0)
+
+class FakeArchive:
+    """Local stand-in for NasaExoplanetArchive serving rows from an in-memory table."""
+
+    def __init__(self, names):
+        from astropy.table import Table
+        from hztrak.core import PSCOMPPARS_COLUMNS, PSCOMPPARS_ERROR_COLUMNS
+        rows = {col: np.arange(len(names), dtype=float) for col in PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS}
+        rows['pl_name'] = names
+        rows['hostname'] = [name[:-2] for name in names]
+        self.table = Table(rows)
+        self.calls = []
+
+    def query_criteria(self, table, select, where=None):
+        self.calls.append(where)
+        if where is None:
+            return self.table[select.split(',')]
+        requested = [name.strip("'") for name in where[len("pl_name in ("):-1].split(',')]
+        mask = np.isin(self.table['pl_name'], requested)
+        return self.table[select.split(',')][mask]
+
+def test_get_current_parameters_batches_and_orders():
+    from hztrak.core import get_current_parameters, PSCOMPPARS_COLUMNS
+    archive = FakeArchive([f'Star-{i} b' for i in range(10)])
+    names = ['Star-7 b', 'Star-2 b', 'Star-5 b', 'Star-0 b', 'Star-9 b']
+    df = get_current_parameters(names, cache_path=None, archive=archive, chunk_size=2)
+    assert list(df.columns) == PSCOMPPARS_COLUMNS
+    assert list(df['pl_name']) == names
+    assert len(archive.calls) == 3
+
+def test_get_current_parameters_cache_skips_archive(tmp_path):
+    from hztrak.core import get_current_parameters
+    cache_path = tmp_path / 'cache.pkl'
+    archive = FakeArchive(['Star-0 b', 'Star-1 b'])
+    first = get_current_parameters(['Star-0 b', 'Star-1 b', 'Nowhere b'], cache_path=str(cache_path), archive=archive)
+    assert len(first) == 2
+    assert len(archive.calls) == 1
+    assert (first.dtypes.drop(['pl_name', 'hostname']) == float).all()
+    uncached = get_current_parameters(['Star-1 b'], cache_path=None, archive=FakeArchive(['Star-1 b']))
+    assert (uncached.dtypes.drop(['pl_name', 'hostname']) == float).all()
+    assert np.isfinite(uncached['st_lum'].to_numpy()).all()
+
+    second = get_current_parameters(['Star-1 b', 'Star-0 b'], cache_path=str(cache_path), archive=archive)
+    assert len(archive.calls) == 1
+    assert list(second['pl_name']) == ['Star-1 b', 'Star-0 b']
+    assert (second.dtypes.drop(['pl_name', 'hostname']) == float).all()
+
+    get_current_parameters(['Star-0 b'], cache_path=str(cache_path), ttl=0, archive=archive)
+    assert len(archive.calls) == 2
+
+def test_get_current_parameters_from_mirror(tmp_path):
+    from hztrak.core import get_current_parameters
+    from hztrak.mirror import snapshot_pscomppars, PlanetMirror
+    archive = FakeArchive([f'Star-{i} b' for i in range(50)])
+    path = snapshot_pscomppars(str(tmp_path / 'mirror.npy'), archive=archive)
+
+    mirror = PlanetMirror(path)
+    assert mirror._data is None
+    df = get_current_parameters(['Star-42 b', 'Star-3 b', 'Nowhere b'], archive=None, mirror=mirror)
+    assert list(df['pl_name']) == ['Star-42 b', 'Star-3 b']
+    assert df['st_teff'].tolist() == [42.0, 3.0]
+    assert list(mirror.lookup_host(['Star-7'])['pl_name']) == ['Star-7 b']
+
+    by_path = get_current_parameters(['Star-1 b'], archive=None, mirror=path)
+    assert by_path['pl_name'][0] == 'Star-1 b'
+
+def test_import_core_is_lazy():
+    import subprocess
+    code = ("import sys, hztrak.core, hztrak.evol_calc, hztrak.plotting; "
+            "print(','.join(m for m in ('astroquery', 'matplotlib', 'pandas') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.join(os.path.dirname(__file__), '..'))
+    assert result.stdout.strip() == ''
+
+def test_orbit_adapters_match_astropy():
+    from astropy.constants import G
+    from hztrak import core
+    period = core.__orb_per_from_au(0.5 * u.Msun, 2 * u.AU)
+    expected = (2 * np.pi * np.sqrt((2 * u.AU) ** 3 / (G * 0.5 * u.Msun))).to(u.d)
+    assert period.unit == u.d
+    assert np.isclose(period.value, expected.value)
+    axis = core.__au_from_orb_per(0.5, period.value)
+    assert axis.unit == u.AU
+    assert np.isclose(axis.value, 2.0)
+    assert core.__au_from_orb_per(1.0, None) is None
+
+def test_orbit_kernels_are_unit_free():
+    from hztrak import core
+    masses = np.array([0.1, 1.0, 2.0])
+    periods = core.__kepler_period_days(masses, np.ones(3))
+    assert isinstance(periods, np.ndarray)
+    assert np.allclose(core.__kepler_axis_au(masses, periods), 1.0)
+
+def test_orbit_converters_mask_missing_values():
+    from hztrak.core import au_from_orb_per, orb_per_from_au
+    masses = np.array([1.0, np.nan, 0.5])
+    periods = np.array([365.25689838, 100.0, np.nan])
+    axes = au_from_orb_per(masses, periods)
+    assert np.isclose(axes[0], 1.0)
+    assert np.isnan(axes[1:]).all()
+    assert np.isclose(orb_per_from_au(1 * u.Msun, 1 * u.AU), 365.25689838)
+
+def test_fill_orbits_completes_table():
+    import pandas as pd
+    from hztrak.core import fill_orbits
+    df = pd.DataFrame({'st_mass': [1.0, 1.0, np.nan],
+                       'pl_orbper': [365.25689838, np.nan, 10.0],
+                       'pl_orbsmax': [np.nan, 1.0, np.nan]})
+    filled = fill_orbits(df)
+    assert np.isclose(filled['pl_orbsmax'][0], 1.0)
+    assert np.isclose(filled['pl_orbper'][1], 365.25689838)
+    assert np.isnan(filled['pl_orbsmax'][2])
+    assert np.isnan(df['pl_orbsmax'][0])
+
+def test_classify_catalog():
+    import pandas as pd
+    from hztrak.core import classify_catalog
+    bounds = find_hz(5780, 1.0)['Distance'].value
+    orbits = [0.5, (bounds[0] + bounds[2]) / 2, 1.0, (bounds[4] + bounds[5]) / 2, 3.0, np.nan]
+    df = pd.DataFrame({'pl_name': list('abcdef'), 'st_teff': 5780.0, 'st_lum': 0.0, 'st_mass': 1.0,
+                       'pl_orbper': np.nan, 'pl_orbsmax': orbits})
+    result = classify_catalog(df)
+    assert list(result['hz_class'].cat.codes) == [0, 1, 2, 1, 3, -1]
+    assert result['hz_class'].cat.codes.dtype == np.int8
+    assert result['hz_position'].dtype == np.float32
+    assert np.isclose(result['hz_position'][2], (1.0 - bounds[2]) / (bounds[4] - bounds[2]))
+    assert list(result[result['hz_class'] == 'conservative']['pl_name']) == ['c']
+
+def test_hz_cache_counts_and_evicts():
+    from hztrak.core import HZ_CACHE
+    try:
+        HZ_CACHE.configure(maxsize=2, teff_tol=1.0, lum_tol=1e-3)
+        first = find_hz(5780.2, 1.0)
+        find_hz(5780.4, 1.0001)   # same bin
+        assert HZ_CACHE.info()['hits'] == 1
+        assert HZ_CACHE.info()['misses'] == 1
+        assert np.allclose(first['Distance'].value, find_hz_batch(5780, 1.0)[0])
+
+        find_hz(4000, 0.1)
+        find_hz(3000, 0.01)
+        assert HZ_CACHE.info()['evictions'] == 1
+        HZ_CACHE.resize(1)
+        assert HZ_CACHE.info()['size'] == 1
+        with pytest.raises(RuntimeError):
+            find_hz(5780, -1.0)
+    finally:
+        HZ_CACHE.configure(maxsize=0, teff_tol=0.1, lum_tol=1e-5)
+        HZ_CACHE.clear()
+    assert not HZ_CACHE.enabled
+
+def test_seff_grid_within_error_bound(tmp_path):
+    from hztrak.core import load_seff_grid, KOPPARAPU_TEFF_RANGE
+    grid = load_seff_grid(step=5.0, cache_dir=str(tmp_path))
+    assert os.path.exists(tmp_path / 'seff_grid_5K.npz')
+
+    teff = np.linspace(*KOPPARAPU_TEFF_RANGE, 9999)
+    lum = np.full_like(teff, 0.8)
+    exact, _ = find_hz_batch(teff, lum)
+    interpolated, valid = find_hz_batch(teff, lum, grid=grid)
+    assert valid.all()
+    seff_exact = lum[:, np.newaxis] / exact ** 2
+    seff_interp = lum[:, np.newaxis] / interpolated ** 2
+    assert np.all(np.abs(seff_exact - seff_interp) <= grid.max_error)
+
+def test_seff_grid_masks_out_of_range():
+    from hztrak.core import build_seff_grid
+    grid = build_seff_grid(step=10.0)
+    distances, valid = find_hz_batch([2000, 5780, 9000], 1.0, grid=grid)
+    assert list(valid.all(axis=1)) == [False, True, False]
+    assert np.isnan(distances[[0, 2]]).all()
+
+def test_seff_grid_range_with_uneven_step(tmp_path):
+    from hztrak.core import build_seff_grid, SeffGrid
+    #7 K does not divide the 4600 K range, the last grid point is 7206 K
+    grid = build_seff_grid(step=7.0)
+    assert grid.teff_max > 7200
+    _, valid = find_hz_batch([2600, 7200, 7203], 1.0, grid=grid)
+    assert list(valid.all(axis=1)) == [True, True, False]
+    grid.save(str(tmp_path / 'grid.npz'))
+    assert SeffGrid.load(str(tmp_path / 'grid.npz')).teff_range == (2600.0, 7200.0)
+
+def test_get_current_parameters_uncertainties(tmp_path):
+    from hztrak.core import get_current_parameters, PSCOMPPARS_COLUMNS, PSCOMPPARS_ERROR_COLUMNS
+    from hztrak.mirror import snapshot_pscomppars
+    archive = FakeArchive(['Star-0 b', 'Star-1 b'])
+    cache_path = str(tmp_path / 'cache.pkl')
+    get_current_parameters(['Star-1 b'], cache_path=cache_path, archive=archive)
+    df = get_current_parameters(['Star-1 b'], cache_path=cache_path, archive=archive, uncertainties=True)
+    assert list(df.columns) == PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS
+    assert len(archive.calls) == 2
+
+    path = snapshot_pscomppars(str(tmp_path / 'mirror.npy'), archive=archive)
+    from_mirror = get_current_parameters(['Star-1 b'], mirror=path, uncertainties=True)
+    assert from_mirror['st_tefferr1'][0] == 1.0
@@ -4,11 +4,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
 import numpy as np
 import astropy.units as u
-from hztrak.evol_calc import calc
+from hztrak import evol_calc
 
 @pytest.fixture
 def model():
-    return calc()
+    return evol_calc
 
 def test_alpha_beta_gamma_low_mass(model):
     alpha, beta, gamma = model.alpha_beta_gamma(0.3 * u.Msun)
@@ -60,10 +60,95 @@ def test_evolve_star_table_output(model):
     age = 10 * u.Gyr
     steps = 5
 
-    result_table = model.evolve_star(L_0, R_0, T_0, mass, t_f=age, steps=steps)
+    result_table = model.evolve_star(L_0, R_0, T_0, mass, t_f=age, steps=steps, as_table=True)
 
     assert len(result_table) == steps
     assert 'time_yr' in result_table.colnames
     assert result_table['luminosity_Lsun'].unit == u.Lsun
     assert result_table['radius_Rsun'].unit == u.Rsun
     assert result_table['temperature_K'].unit == u.K
+
+def test_evolve_star_structured_output(model):
+    track = model.evolve_star(1.0, 1.0, 5800, 1.0, t_f=10, steps=5)
+    assert track.dtype == model.EVOLUTION_DTYPE
+    assert track['time_yr'][-1] == 10
+    # at t_f the power law term is 1
+    assert np.isclose(track['luminosity_Lsun'][-1], 1.4)
+    assert np.isclose(track['radius_Rsun'][-1], 1.1)
+
+def test_alpha_beta_gamma_batch_matches_scalar(model):
+    masses = np.array([0.1, 0.43, 1.0, 2.0, 19.9, 20.0, 60.0])
+    alpha, beta, gamma = model.alpha_beta_gamma_batch(masses)
+    for i, mass in enumerate(masses):
+        assert (alpha[i], beta[i], gamma[i]) == model.alpha_beta_gamma(mass)
+    assert np.isnan(model.alpha_beta_gamma_batch([np.nan])[0]).all()
+
+def test_evolve_population_matches_evolve_star(model):
+    L_0 = np.array([0.01, 1.0, 30.0])
+    R_0 = np.array([0.2, 1.0, 2.5])
+    T_0 = np.array([3000, 5800, 9000])
+    mass = np.array([0.2, 1.0, 3.0])
+    times, L, R, T = model.evolve_population(L_0, R_0, T_0, mass, t_f=10, steps=7)
+    assert L.shape == R.shape == T.shape == (3, 7)
+    for i in range(3):
+        track = model.evolve_star(L_0[i], R_0[i], T_0[i], mass[i], t_f=10, steps=7)
+        assert np.allclose(track['luminosity_Lsun'], L[i])
+        assert np.allclose(track['temperature_K'], T[i])
+
+    chunked = model.evolve_population(L_0, R_0, T_0, mass, t_f=10, steps=7, chunk_size=2)
+    assert np.array_equal(chunked[3], T)
+
+def test_hz_track_matches_find_hz(model):
+    from hztrak.core import find_hz
+    star = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5780, 'st_mass': 1.0, 'st_age': 4.6}
+    track = model.hz_track(star, steps=4)
+    assert track.dtype == model.HZ_TRACK_DTYPE
+    expected = find_hz(track['temperature_K'][2], track['luminosity_Lsun'][2])['Distance'].value
+    assert np.isclose(track['rg1_AU'][2], expected[2])
+    assert np.isclose(track['em_AU'][2], expected[5])
+
+def test_time_in_hz_interpolates_crossings(model):
+    star = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5780, 'st_mass': 1.0, 'st_age': 10.0}
+    planet_au = np.array([0.5, 1.0, 1.3, 5.0])
+    coarse = model.time_in_hz(model.hz_track(star, steps=30), planet_au)
+    dense = model.time_in_hz(model.hz_track(star, steps=20000), planet_au)
+
+    assert np.allclose(coarse['conservative_time'], dense['conservative_time'], rtol=1e-2)
+    assert np.isnan(coarse['conservative_entry'][[0, 3]]).all()
+    assert coarse['conservative_entry'][1] == 0
+    # the hz moves outwards, so the planet at 1 AU leaves through the inner edge before t_f
+    assert 0 < coarse['conservative_exit'][1] < 10
+    assert coarse['conservative_time'][2] == 10
+
+def test_time_in_hz_batched_tracks(model):
+    star = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5780, 'st_mass': 1.0, 'st_age': 10.0}
+    track = model.hz_track(star, steps=10)
+    single = model.time_in_hz(track, [1.0, 1.1])
+    batched = model.time_in_hz(np.stack([track, track]), [1.0, 1.1])
+    for name in single.dtype.names:
+        assert np.array_equal(single[name], batched[name], equal_nan=True)
+
+def test_time_in_hz_unknown_is_nan(model):
+    star = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5780, 'st_mass': 1.0, 'st_age': 10.0}
+    track = model.hz_track(star, steps=10)
+    missing = np.full(10, np.nan, dtype=model.HZ_TRACK_DTYPE)
+    result = model.time_in_hz(np.stack([track, track, missing]), [np.nan, 5.0, 1.0])
+    for zone in model.HZ_ZONES:
+        assert np.isnan(result[f'{zone}_time'][[0, 2]]).all()
+        assert np.isnan(result[f'{zone}_entry'][[0, 2]]).all() and np.isnan(result[f'{zone}_exit'][[0, 2]]).all()
+        assert result[f'{zone}_time'][1] == 0   # known to be never inside
+
+def test_evolve_star_adaptive_beats_uniform_grid(model):
+    star = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5780, 'st_mass': 1.0}
+    track, stats = model.evolve_star_adaptive(1.0, 1.0, 5780, 1.0, t_f=10, tol=1e-4)
+    assert stats['evaluations'] == len(track)
+    assert stats['saved'] > 0
+    assert np.all(np.diff(track['time_yr']) > 0)
+
+    dense = model.hz_track(star, t_f=10, steps=20001)
+    uniform = model.hz_track(star, t_f=10, steps=len(track))
+    def max_error(coarse):
+        return np.max(np.abs(np.interp(dense['time_yr'], coarse['time_yr'], coarse['rg1_AU']) - dense['rg1_AU']))
+    assert max_error(track) <= max_error(uniform)
+
+    assert np.array_equal(model.hz_track(star, t_f=10, steps=5, tol=1e-4), track)
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import numpy as np
+from hztrak.evol_calc import hz_track
+from hztrak.hzindex import HZIndex
+
+AGES = np.linspace(0, 1e10, 101)
+
+def stars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        mass = rng.uniform(0.5, 1.5)
+        star = {'st_lum': mass ** 4, 'st_rad': mass, 'st_teff': 5772 * mass ** 0.5, 'st_mass': mass,
+                'st_age': rng.uniform(2e9, 1e10)}
+        yield f'Star-{i}', hz_track(star, steps=50)
+
+def brute_force(tracks, lo, hi, age):
+    hosts = []
+    for host, track in tracks:
+        if age > track['time_yr'][-1]:
+            continue
+        inner = np.interp(age, track['time_yr'], track['rg1_AU'])
+        outer = np.interp(age, track['time_yr'], track['mxg_AU'])
+        if inner <= hi and outer >= lo:
+            hosts.append(host)
+    return hosts
+
+def test_index_matches_brute_force():
+    tracks = list(stars(200))
+    index = HZIndex(AGES)
+    assert index.add(tracks) == 200
+    for lo, hi, age in [(1.2, 1.2, 3e9), (0.5, 0.8, 1e9), (2.0, 3.0, 6e9), (1.0, 1.0, 9.9e9)]:
+        expected = brute_force(tracks, lo, hi, age)
+        assert index.query(lo, age, hi) == expected
+        assert index.count(lo, age, hi) == len(expected)
+
+    distances = np.linspace(0.3, 3.0, 40)
+    counts = index.count(distances[:, np.newaxis], np.array([1e9, 3e9, 5e9]))
+    assert counts.shape == (40, 3)
+    assert counts[7, 1] == len(brute_force(tracks, distances[7], distances[7], 3e9))
+    assert index.count(1.0, 2e10) == 0 and index.query(1.0, 2e10) == []
+
+def test_incremental_add_and_save(tmp_path):
+    tracks = list(stars(60, seed=1))
+    whole = HZIndex(AGES, zone='optimistic')
+    whole.add(tracks)
+    index = HZIndex(AGES, zone='optimistic')
+    index.add(tracks[:20])
+    index.add(tracks[20:])
+    assert np.array_equal(index._inner_sorted, whole._inner_sorted)
+    assert index.query([0.9, 1.5], 4e9) == whole.query([0.9, 1.5], 4e9)
+    with pytest.raises(ValueError):
+        index.add(tracks[:1])
+
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = HZIndex.load(path)
+    assert loaded.zone == 'optimistic' and len(loaded) == 60
+    assert np.array_equal(loaded.count([0.5, 1.0, 2.0], 5e9), index.count([0.5, 1.0, 2.0], 5e9))
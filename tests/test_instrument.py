@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import pytest
+from hztrak import instrument
+from hztrak.core import find_hz
+from hztrak.evol_calc import hz_track
+
+@pytest.fixture
+def stats():
+    instrument.STATS.reset()
+    yield instrument.STATS
+    instrument.disable()
+    instrument.STATS.reset()
+
+def test_disabled_records_nothing(stats):
+    find_hz(5780, 1.0)
+    assert stats.as_dict() == {}
+
+def test_stages_are_recorded(stats):
+    instrument.enable(track_memory=True)
+    star = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5780, 'st_mass': 1.0, 'st_age': 4.6}
+    hz_track(star, steps=1000)
+    hz_track(star, steps=1000)
+    find_hz(5780, 1.0)   # find_hz calls find_hz_batch, only the outer call counts
+
+    result = stats.as_dict()
+    assert result['evolve']['calls'] == 2
+    assert result['hz']['calls'] == 3
+    assert result['hz']['time_s'] > 0
+    assert result['evolve']['bytes'] > 1000 * 8
+    assert json.loads(stats.to_json()) == result
+
+def test_stage_context_manager(stats):
+    instrument.enable()
+    with instrument.stage('fetch'):
+        with instrument.stage('fetch'):
+            pass
+    assert stats.as_dict()['fetch']['calls'] == 1
@@ -0,0 +1,133 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import numpy as np
+import pandas as pd
+from hztrak.core import PSCOMPPARS_COLUMNS
+from hztrak import pipeline
+
+@pytest.fixture
+def catalog():
+    n = 7
+    return pd.DataFrame({
+        'pl_name': [f'Star-{i // 2} {"bc"[i % 2]}' for i in range(n)],
+        'hostname': [f'Star-{i // 2}' for i in range(n)],
+        'pl_rade': np.nan, 'pl_bmasse': np.nan, 'pl_ratror': np.nan,
+        'st_teff': np.linspace(3500, 6500, n),
+        'st_rad': np.linspace(0.4, 1.5, n),
+        'st_mass': np.linspace(0.3, 1.4, n),
+        'st_lum': np.linspace(-1.5, 0.5, n),
+        'st_age': [1.0, 2.0, 3.0, np.nan, 5.0, 6.0, 7.0],
+        'pl_orbper': np.linspace(10, 500, n),
+        'pl_orbsmax': np.nan,
+    })[PSCOMPPARS_COLUMNS]
+
+@pytest.fixture
+def shared_catalog(catalog):
+    #Star-0 and Star-2 list the same stellar parameters for both planets, Star-1 does not
+    shared = catalog.copy()
+    stellar = ['st_teff', 'st_rad', 'st_mass', 'st_lum', 'st_age']
+    shared.loc[1, stellar] = shared.loc[0, stellar]
+    shared.loc[5, stellar] = shared.loc[4, stellar]
+    return shared
+
+def test_run_catalog_writes_and_resumes(catalog, tmp_path):
+    out = str(tmp_path / 'run')
+    done = pipeline.run_catalog(catalog, out, steps=8, chunk_size=3, workers=1)
+    assert done == [0, 1, 2]
+    results = pipeline.load_results(out)
+    assert list(results['pl_name']) == list(catalog['pl_name'])
+    assert results['tracks'].shape == (7, 8)
+    assert np.isnan(results['tracks']['rg1_AU'][3]).all()
+    assert results['tracks']['time_yr'][6, -1] == 7.0
+
+    os.remove(os.path.join(out, 'chunk_000001.npz'))
+    assert pipeline.run_catalog(catalog, out, steps=8, chunk_size=3, workers=1) == [1]
+    with pytest.raises(ValueError):
+        pipeline.run_catalog(catalog, out, steps=9, chunk_size=3, workers=1)
+
+def test_run_catalog_process_pool_matches_serial(catalog, tmp_path):
+    pipeline.run_catalog(catalog, str(tmp_path / 'serial'), steps=8, chunk_size=2, workers=1)
+    pipeline.run_catalog(catalog, str(tmp_path / 'pool'), steps=8, chunk_size=2, workers=2)
+    serial = pipeline.load_results(str(tmp_path / 'serial'))
+    pool = pipeline.load_results(str(tmp_path / 'pool'))
+    assert np.array_equal(serial['tracks']['mxg_AU'], pool['tracks']['mxg_AU'], equal_nan=True)
+
+def test_cli_run_from_mirror(shared_catalog, tmp_path, capsys):
+    from hztrak.cli import main
+    from hztrak.mirror import write_mirror
+    path = write_mirror(shared_catalog, str(tmp_path / 'mirror.npy'))
+    out = str(tmp_path / 'cli')
+    main(['run', '--mirror', path, '--out', out, '--steps', '5', '--workers', '1'])
+    assert len(pipeline.load_results(out)['pl_name']) == len(shared_catalog)
+    main(['plot', out, '--out', str(tmp_path / 'figures'), '--workers', '1'])
+    assert sorted(os.listdir(tmp_path / 'figures')) == ['Star-0.png', 'Star-1.png', 'Star-1_Star-1_c.png', 'Star-2.png', 'Star-3.png']
+    #Star-1 c has no st_age, so its track is unknown at every age
+    main(['query', out, '--distance', '0.1', '--distance-max', '100', '--age', '0'])
+    assert capsys.readouterr().err.strip() == '4 of 5 systems'
+    main(['query', out, '--distance', '0.01', '--distance-max', '100', '--age', '3'])
+    out_text = capsys.readouterr()
+    assert out_text.out.split() == ['Star-1', 'Star-2', 'Star-3'] and out_text.err.strip() == '3 of 5 systems'
+
+def test_iter_system_tracks_streams_into_store(shared_catalog, tmp_path):
+    from hztrak.store import write_tracks, TrackReader
+    path = str(tmp_path / 'store')
+    assert write_tracks(path, pipeline.iter_system_tracks(shared_catalog, steps=6), row_group_size=10) == 5
+    reader = TrackReader(path)
+    assert reader.star_ids == ['Star-0', 'Star-1', 'Star-1 (Star-1 c)', 'Star-2', 'Star-3']
+    assert len(reader['Star-2']) == 6
+    #the sibling with its own stellar parameters keeps its own track
+    assert np.isnan(reader['Star-1 (Star-1 c)']['rg1_AU']).all() and np.isfinite(reader['Star-1']['rg1_AU']).all()
+
+def test_hosts_evolved_once(catalog, shared_catalog, monkeypatch):
+    first, index = pipeline.host_index(['B', 'A', 'B', 'C', 'A'])
+    assert list(first) == [0, 1, 3] and list(index) == [0, 1, 0, 2, 1]
+    shared = shared_catalog
+    assert pipeline.duplicate_work(catalog) == {'planets': 7, 'hosts': 7, 'avoided': 0}
+    assert pipeline.duplicate_work(shared) == {'planets': 7, 'hosts': 5, 'avoided': 2}
+
+    calls = []
+    system_track = pipeline.system_track
+    monkeypatch.setattr(pipeline, 'system_track', lambda row, *args: calls.append(row['pl_name']) or system_track(row, *args))
+    result = pipeline.process_chunk(pipeline.fill_orbits(shared).to_dict('records'), steps=5)
+    assert calls == list(shared['pl_name'].drop(index=[1, 5]))
+    assert np.array_equal(result['tracks'][0], result['tracks'][1])
+    #siblings with different stellar parameters keep their own track
+    result = pipeline.process_chunk(pipeline.fill_orbits(catalog).to_dict('records'), steps=5)
+    assert not np.array_equal(result['tracks']['rg1_AU'][0], result['tracks']['rg1_AU'][1])
+
+def test_results_independent_of_chunk_size(catalog, tmp_path):
+    for chunk_size in (3, 7):
+        pipeline.run_catalog(catalog, str(tmp_path / str(chunk_size)), steps=5, chunk_size=chunk_size, workers=1)
+    small, whole = (pipeline.load_results(str(tmp_path / str(c))) for c in (3, 7))
+    for field in small['tracks'].dtype.names:
+        assert np.array_equal(small['tracks'][field], whole['tracks'][field], equal_nan=True)
+
+def test_update_catalog_recomputes_only_changes(catalog, tmp_path, monkeypatch):
+    out = str(tmp_path / 'nightly')
+    pipeline.run_catalog(catalog, out, steps=6, chunk_size=3, workers=1)
+    assert pipeline.update_catalog(catalog, out, steps=6, chunk_size=3, workers=1) == {'computed': 0, 'reused': 7, 'removed': 0}
+    before = pipeline.load_results(out)
+
+    computed = []
+    process_chunk = pipeline.process_chunk
+    monkeypatch.setattr(pipeline, 'process_chunk', lambda rows, *args: computed.extend(r['pl_name'] for r in rows) or process_chunk(rows, *args))
+    changed = catalog.drop(index=1).reset_index(drop=True)
+    changed.loc[3, 'st_teff'] += 10
+    changed.loc[len(changed)] = catalog.iloc[0].replace({'Star-0 b': 'Star-9 b', 'Star-0': 'Star-9'})
+    stats = pipeline.update_catalog(changed, out, steps=6, chunk_size=3, workers=1)
+    assert stats == {'computed': 2, 'reused': 5, 'removed': 1}
+    assert computed == ['Star-2 b', 'Star-9 b']
+
+    after = pipeline.load_results(out)
+    assert list(after['pl_name']) == list(changed['pl_name'])
+    assert sorted(os.listdir(out)) == ['chunk_000000.npz', 'chunk_000001.npz', 'chunk_000002.npz', 'manifest.json']
+    assert np.array_equal(after['tracks']['mxg_AU'][4], before['tracks']['mxg_AU'][5])
+    assert not np.array_equal(after['tracks']['mxg_AU'][3], before['tracks']['mxg_AU'][4])
+    assert np.array_equal(after['tracks']['mxg_AU'][-1], before['tracks']['mxg_AU'][0])
+    assert pipeline.run_catalog(changed, out, steps=6, chunk_size=3, workers=1) == []
+
+    computed.clear()
+    assert pipeline.update_catalog(changed, out, steps=7, chunk_size=3, workers=1)['computed'] == 7
+    assert pipeline.load_results(out)['tracks'].shape == (7, 7)
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import astropy.units as u
+from astropy.table import QTable
+from matplotlib.collections import LineCollection
+from hztrak import plotting
+from hztrak.evol_calc import hz_track
+
+STAR = {'st_lum': 1.0, 'st_rad': 1.0, 'st_teff': 5772.0, 'st_mass': 1.0, 'st_age': 4.6e9}
+
+def test_visualize_1_uses_one_collection_for_planets():
+    table = QTable([[0, 1, 2, 3] * u.Gyr, [0.8, 0.8, 0.9, 1.2] * u.AU, [1, 1, 1.1, 1.5] * u.AU],
+                   names=('time', 'distance_hz_in', 'distance_hz_out'))
+    fig, ax = plotting.visualize_1(table, np.linspace(0.5, 2.0, 1000))
+    assert len(ax.lines) == 0
+    lines = [c for c in ax.collections if isinstance(c, LineCollection)]
+    assert len(lines) == 1 and len(lines[0].get_segments()) == 1000
+    assert ax.get_ylim()[1] >= 2.0
+    assert ax.get_xlabel() == 'Time (Gyr)'
+
+def test_visualize_track_and_polar_return_figures():
+    track = hz_track(STAR, steps=20)
+    fig, ax = plotting.visualize_track(track, [1.0, 1.5])
+    assert len(ax.collections) == 3   # one fill per scenario and one LineCollection
+    assert ax.get_xlabel() == 'Time (Gyr)'
+    assert plotting.visualize_track(track, time_unit='yr')[1].get_xlabel() == 'Time (yr)'
+    fig, ax = plotting.visualize_polar({'pl_orbsmax': np.array([0.5, 1.0, 1.8])}, None, (0.95, 1.68))
+    assert ax.name == 'polar'
+
+def test_export_systems(tmp_path):
+    track = hz_track(STAR, steps=10)
+    systems = [('Sun', track, [1.0]), ('HD 1/b', track, [0.7, 1.5])]
+    serial = plotting.export_systems(systems, str(tmp_path / 'serial'), workers=1)
+    assert [os.path.basename(p) for p in serial] == ['Sun.png', 'HD_1_b.png']
+    pool = plotting.export_systems(systems, str(tmp_path / 'pool'), fmt='svg', workers=2, batch_size=1)
+    assert all(os.path.getsize(p) > 0 for p in pool + serial)
@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from hztrak.evol_calc import hz_track, HZ_TRACK_DTYPE
+from hztrak.store import TrackWriter, TrackReader, write_tracks
+
+def make_tracks(n):
+    for i in range(n):
+        star = {'st_lum': 0.5 + i, 'st_rad': 1.0, 'st_teff': 4000 + 100 * i, 'st_mass': 1.0, 'st_age': 5.0}
+        yield f'Star-{i}', hz_track(star, steps=5 + i)
+
+def test_write_tracks_round_trip(tmp_path):
+    path = str(tmp_path / 'store')
+    assert write_tracks(path, make_tracks(6), row_group_size=8) == 6
+
+    reader = TrackReader(path)
+    assert len(reader) == 6
+    assert reader.fields == HZ_TRACK_DTYPE.names
+    for star_id, track in make_tracks(6):
+        stored = reader[star_id]
+        assert len(stored) == len(track)
+        for field in HZ_TRACK_DTYPE.names:
+            assert np.array_equal(stored[field], track[field])
+    assert isinstance(reader.column('rg1_AU'), np.memmap)
+
+def test_track_writer_appends_to_existing_store(tmp_path):
+    path = str(tmp_path / 'store')
+    tracks = list(make_tracks(4))
+    write_tracks(path, tracks[:2])
+    with TrackWriter(path, append=True) as writer:
+        for star_id, track in tracks[2:]:
+            writer.append(star_id, track)
+
+    reader = TrackReader(path)
+    assert reader.star_ids == ['Star-0', 'Star-1', 'Star-2', 'Star-3']
+    assert np.array_equal(reader['Star-3']['em_AU'], tracks[3][1]['em_AU'])
+
+def test_append_after_crash_mid_flush(tmp_path):
+    from hztrak.store import column_file, INDEX
+    path = str(tmp_path / 'store')
+    tracks = list(make_tracks(4))
+    write_tracks(path, tracks[:2])
+    #crash while flushing the next row group: only some column files and half an index line written
+    with open(column_file(path, 'time_yr'), 'ab') as f:
+        f.write(b'\0' * 8 * 7)
+    with open(os.path.join(path, INDEX), 'a') as f:
+        f.write('Star-9\t1')
+
+    with TrackWriter(path, append=True) as writer:
+        for star_id, track in tracks[2:]:
+            writer.append(star_id, track)
+
+    reader = TrackReader(path)
+    assert reader.star_ids == ['Star-0', 'Star-1', 'Star-2', 'Star-3']
+    for star_id, track in tracks:
+        assert np.array_equal(reader[star_id]['time_yr'], track['time_yr'])
+        assert np.array_equal(reader[star_id]['em_AU'], track['em_AU'])
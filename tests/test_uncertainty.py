@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import numpy as np
+import pandas as pd
+from hztrak.core import PSCOMPPARS_COLUMNS, PSCOMPPARS_ERROR_COLUMNS
+from hztrak.uncertainty import hz_uncertainty, sample_parameters
+
+@pytest.fixture
+def catalog():
+    n = 5
+    df = pd.DataFrame({
+        'pl_name': [f'Star-{i} b' for i in range(n)], 'hostname': [f'Star-{i}' for i in range(n)],
+        'pl_rade': np.nan, 'pl_bmasse': np.nan, 'pl_ratror': np.nan,
+        'st_teff': np.linspace(3500, 6000, n), 'st_rad': np.linspace(0.4, 1.2, n),
+        'st_mass': np.linspace(0.4, 1.1, n), 'st_lum': np.linspace(-1.5, 0.1, n),
+        'st_age': np.linspace(1, 5, n) * 1e9, 'pl_orbper': np.nan, 'pl_orbsmax': np.linspace(0.15, 1.2, n),
+    })[PSCOMPPARS_COLUMNS]
+    for col, err in (('st_teff', 100.0), ('st_lum', 0.05), ('st_mass', 0.05), ('st_age', 1e9)):
+        df[f'{col}err1'], df[f'{col}err2'] = err, -err / 2
+    df.loc[0, ['st_ageerr1', 'st_ageerr2']] = np.nan
+    return df[PSCOMPPARS_COLUMNS + PSCOMPPARS_ERROR_COLUMNS]
+
+def test_sample_parameters_split_normal(catalog):
+    samples = sample_parameters(catalog, 4000, np.random.default_rng(0))
+    assert samples['st_teff'].shape == (5, 4000)
+    assert (samples['st_age'][0] == catalog['st_age'][0]).all()
+    above = samples['st_teff'] - catalog['st_teff'].to_numpy()[:, np.newaxis]
+    assert np.std(above[above > 0]) > 1.5 * np.std(above[above < 0])
+
+def test_hz_uncertainty_bands(catalog):
+    result = hz_uncertainty(catalog, n_samples=200, steps=10, seed=1)
+    edges = result['hz_edges']
+    assert edges.shape == (5, 3, 6)
+    assert (np.diff(edges, axis=1) >= 0).all()
+    assert (edges[:, 1, 2] < edges[:, 1, 4]).all()
+    for times in result['hz_time'].values():
+        assert times.shape == (5, 3)
+        assert (np.diff(times, axis=1) >= 0).all()
+
+def test_hz_uncertainty_reproducible_across_chunks(catalog):
+    a = hz_uncertainty(catalog, n_samples=50, steps=6, seed=3, chunk_size=2)
+    b = hz_uncertainty(catalog, n_samples=50, steps=6, seed=3)
+    assert np.array_equal(a['hz_edges'], b['hz_edges'])
+    for zone in a['hz_time']:
+        assert np.array_equal(a['hz_time'][zone], b['hz_time'][zone])